@@ -1,13 +1,414 @@
 #!/usr/bin/env python3
+"""
+Serve the Tic Tac Toe game locally, along with a JSON API that searches for the moves of
+the Minimax AI players natively in CPython, which is many times faster than in Brython.
+
+    POST /move
+        {"board": [["x", "", ""], ["", "o", ""], ["", "", ""]], "next_player": "p1",
+         "piece": "x", "difficulty": "hard", "win_len": 3, "move_history": [0, 4]}
+    ->  {"piece": "x", "cell": 8}
+
+Moves are cell numbers: the cell at (row, col) of a board with side length `side` is
+number `row * side + col`, and boards up to `tictactoe.MAX_SIDE` cells wide are
+accepted. `win_len` (the board side length by default) and `move_history` (empty by
+default) are optional. Every request is searched by a new player, but all players of the
+same difficulty and board share one transposition table for the life of the server, so
+that positions searched for one request are reused by the next ones. Requests are
+handled on their own threads, so the page's files are still served during long searches.
+With `--cache`, the tables are also backed by the persistent position cache of
+`position_cache.py`, which keeps the searched positions across server runs and is shared
+with any other servers using the same file; the cache's hit rates are logged with every
+move.
+
+Text assets (the multi-megabyte Brython scripts above all) are compressed once, when the
+server starts, and served gzip- or Brotli-encoded to the clients that accept it; Brotli
+needs the optional `brotli` package. Every file is served with a strong ETag and a
+`Cache-Control` header from `CACHE_CONTROL`, and conditional requests for unchanged
+files are answered with 304 Not Modified. A file changed on disk is compressed again on
+its next request.
+
+Example:
+    python3 main.py                  # serve on port 8000 and open the game
+    python3 main.py --port 8080 --no-browser
+    python3 main.py --cache          # keep searched positions in cache/positions.sqlite3
+"""
+from typing import Optional
+import argparse
+import functools
+import gzip
+import hashlib
 import http.server
-import socketserver
+import io
+import json
+import os
+import sys
+import threading
 import webbrowser
 
+try:
+    import brotli
+except ImportError:  # Brotli is optional, gzip is always available
+    brotli = None
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "python"))
+import position_cache as pc
+import tictactoe as ttt
+import transposition as tp
+
 PORT = 8000
-Handler = http.server.SimpleHTTPRequestHandler
 
-if __name__ == '__main__':
-    with socketserver.TCPServer(("", PORT), Handler) as httpd:
-        print("serving at port", PORT)
-        webbrowser.open_new_tab(f"http://127.0.0.1:{PORT}")
+# largest request body accepted by the move API, in bytes
+MAX_REQUEST_BYTES = 64 * 1024
+
+# extensions of the files worth compressing; fonts, images and woff2 files are either
+# compressed already or too small to gain from it
+COMPRESSIBLE = (".html", ".css", ".js", ".py", ".json", ".webmanifest", ".svg", ".txt",
+                ".ttf")
+
+# `Cache-Control` of the served files by extension: fonts and icons rarely change, and are
+# kept for a week, while everything else is revalidated with its ETag on every use, so
+# that a new version of the game is picked up at once (the service worker keeps its own
+# versioned copies for offline use)
+CACHE_CONTROL = {
+    ".woff2": "public, max-age=604800",
+    ".ttf": "public, max-age=604800",
+    ".png": "public, max-age=604800",
+    ".svg": "public, max-age=604800",
+    ".ico": "public, max-age=604800"
+}
+DEFAULT_CACHE_CONTROL = "no-cache"
+
+# the transposition tables shared by the searches of the move API, keyed by (difficulty,
+# board side length, winning step length)
+_TABLES = {}
+_TABLES_LOCK = threading.Lock()
+
+# the file of the persistent position cache backing the tables, or `None` to keep the
+# tables in memory only
+_CACHE_PATH = None
+
+
+def shared_table(difficulty: str, side: int, win_len: int) -> tp.TranspositionTable:
+    """
+    return the transposition table shared by the players of the given difficulty and
+    board, creating it on first use
+    """
+    key = (difficulty, side, win_len)
+    with _TABLES_LOCK:
+        if key not in _TABLES:
+            if _CACHE_PATH is None:
+                _TABLES[key] = tp.TranspositionTable()
+            else:
+                _TABLES[key] = pc.PersistentTable(
+                    _CACHE_PATH, pc.namespace(difficulty, side, win_len))
+        return _TABLES[key]
+
+
+def cache_hit_rates() -> Optional[dict]:
+    """
+    return the hit rates of the persistent position cache over all tables, in the form
+    of `PersistentTable.hit_rates`, or `None` if the tables are not persistent
+    """
+    with _TABLES_LOCK:
+        tables = [table for table in _TABLES.values()
+                  if isinstance(table, pc.PersistentTable)]
+    if not tables:
+        return None
+    probes = sum(table.probes for table in tables)
+    memory_hits = sum(table.memory_hits for table in tables)
+    disk_hits = sum(table.disk_hits for table in tables)
+    return {
+        "probes": probes,
+        "memory_hit_rate": memory_hits / (probes or 1),
+        "disk_hit_rate": disk_hits / (probes or 1),
+        "hit_rate": (memory_hits + disk_hits) / (probes or 1)
+    }
+
+
+def search_move(request: dict) -> dict:
+    """
+    return the move of a Minimax player for the game state in the given request to the
+    move API; a `ValueError` is raised if the request does not describe a game in which
+    the player can move
+
+    >>> search_move({"board": [['x', 'x', ''], ['o', 'o', ''], ['', '', '']],
+    ...              "next_player": "p1", "piece": "x", "difficulty": "hard"})
+    {'piece': 'x', 'cell': 2}
+    >>> search_move({"board": [['x', '', ''], ['', '', ''], ['', '', '']],
+    ...              "next_player": "p2", "piece": "o", "difficulty": "hard",
+    ...              "move_history": [4]})
+    Traceback (most recent call last):
+    ...
+    ValueError: [!] The move history must name distinct cells that hold a piece.
+    """
+    if not isinstance(request, dict):
+        raise ValueError("[!] The move request must be a JSON object.")
+    try:
+        board = request["board"]
+        next_player = request["next_player"]
+        piece = request["piece"]
+        difficulty = request["difficulty"]
+    except KeyError as error:
+        raise ValueError(f"[!] Missing field {error} in the move request.")
+    if difficulty not in {"easy", "hard"}:
+        raise ValueError(f"[!] Unknown difficulty {difficulty!r}.")
+    if piece not in {'x', 'o'} or next_player not in {'p1', 'p2'}:
+        raise ValueError("[!] The piece must be 'x' or 'o', and the next player 'p1' or "
+                         "'p2'.")
+    if not board or any(len(row) != len(board) for row in board) \
+            or any(spot not in {'', 'x', 'o'} for row in board for spot in row):
+        raise ValueError("[!] The board must be a square of '', 'x' and 'o' spots.")
+
+    side = len(board)
+    history = list(request.get("move_history", []))
+    if any(type(cell) is not int or not 0 <= cell < side ** 2 for cell in history):
+        raise ValueError("[!] The move history must be a list of the board's cell "
+                         "numbers.")
+    if len(set(history)) != len(history) \
+            or any(board[cell // side][cell % side] == '' for cell in history):
+        raise ValueError("[!] The move history must name distinct cells that hold a "
+                         "piece.")
+    game = ttt.GameState(board, next_player, history, request.get("win_len"))
+    if game.get_winning_piece() is not None:
+        raise ValueError("[!] The game is already over.")
+
+    table = shared_table(difficulty, side, game.get_win_length())
+    player = ttt.AIMinimaxPlayer(piece, difficulty, table)
+    prev_move = history[-1] if history else None
+    piece, cell = player.return_move(game, prev_move)
+    if isinstance(table, pc.PersistentTable):
+        table.flush()
+    return {"piece": piece, "cell": cell}
+
+
+class Asset:
+    """
+    A served file, along with its compressed encodings.
+
+    Instance Attributes:
+        - mtime: the modification time of the file when it was read, in nanoseconds
+        - etag: the strong entity tag of the file's content
+        - encodings: the body of every available encoding of the file, keyed by the
+          `Content-Encoding` value ('identity' for the file as is)
+    """
+    mtime: int
+    etag: str
+    encodings: dict
+
+    def __init__(self, path: str) -> None:
+        """
+        read the file at the given path, and compress it if it is worth compressing
+
+        >>> asset = Asset(os.path.join(os.path.dirname(os.path.abspath(__file__)),
+        ...                            "index.html"))
+        >>> len(asset.encodings['gzip']) < len(asset.encodings['identity'])
+        True
+        """
+        self.mtime = os.stat(path).st_mtime_ns
+        with open(path, 'rb') as file:
+            body = file.read()
+        self.etag = '"' + hashlib.sha1(body).hexdigest()[:20] + '"'
+        self.encodings = {'identity': body}
+        if path.endswith(COMPRESSIBLE):
+            self.encodings['gzip'] = gzip.compress(body, 9, mtime=0)
+            if brotli is not None:
+                self.encodings['br'] = brotli.compress(body)
+
+    def choose_encoding(self, accept_encoding: str) -> str:
+        """
+        return the smallest available encoding among those in the given
+        `Accept-Encoding` header, or 'identity' if none is accepted
+
+        >>> asset = Asset(os.path.join(os.path.dirname(os.path.abspath(__file__)),
+        ...                            "index.html"))
+        >>> asset.choose_encoding("gzip, deflate"), asset.choose_encoding("gzip;q=0")
+        ('gzip', 'identity')
+        """
+        accepted = set()
+        for item in accept_encoding.split(','):
+            name, _, params = item.strip().partition(';')
+            if params.replace(' ', '') not in {"q=0", "q=0.0", "q=0.00", "q=0.000"}:
+                accepted.add(name.strip().lower())
+        best = 'identity'
+        for name, body in self.encodings.items():
+            if name in accepted and len(body) < len(self.encodings[best]):
+                best = name
+        return best
+
+
+# the assets served so far, keyed by their file paths
+_ASSETS = {}
+
+
+def load_asset(path: str) -> Asset:
+    """
+    return the asset of the file at the given path, reading and compressing the file
+    again if it has changed since it was last loaded
+    """
+    asset = _ASSETS.get(path)
+    if asset is None or asset.mtime != os.stat(path).st_mtime_ns:
+        asset = Asset(path)
+        _ASSETS[path] = asset
+    return asset
+
+
+def precompress(directory: str) -> int:
+    """
+    load the assets of every compressible file below the given directory, skipping
+    hidden directories, and return the number of bytes saved by gzip
+    """
+    saved = 0
+    for dirpath, dirnames, filenames in os.walk(directory):
+        dirnames[:] = [name for name in dirnames if not name.startswith('.')]
+        for filename in filenames:
+            if filename.endswith(COMPRESSIBLE):
+                asset = load_asset(os.path.join(dirpath, filename))
+                saved += len(asset.encodings['identity']) - len(asset.encodings['gzip'])
+    return saved
+
+
+class Handler(http.server.SimpleHTTPRequestHandler):
+    """
+    Serves the files of the game with compression, ETags and cache headers, and the move
+    API at `POST /move`.
+    """
+    # keep connections open between requests; every response has a `Content-Length`
+    protocol_version = "HTTP/1.1"
+    extensions_map = dict(http.server.SimpleHTTPRequestHandler.extensions_map,
+                          **{".webmanifest": "application/manifest+json",
+                             ".py": "text/x-python", ".woff2": "font/woff2"})
+
+    def send_head(self) -> Optional[io.BytesIO]:
+        """
+        send the status and headers of a GET or HEAD request for a file, and return its
+        body; directories without an index, and missing files, are left to
+        `SimpleHTTPRequestHandler`
+        """
+        path = self.translate_path(self.path)
+        if os.path.isdir(path) and self.path.split('?')[0].endswith('/'):
+            path = os.path.join(path, "index.html")
+        if not os.path.isfile(path):
+            return super().send_head()
+
+        asset = load_asset(path)
+        cache_control = CACHE_CONTROL.get(os.path.splitext(path)[1],
+                                          DEFAULT_CACHE_CONTROL)
+        if self._etag_matches(asset.etag):
+            self.send_response(304)
+            self.send_header("ETag", asset.etag)
+            self.send_header("Cache-Control", cache_control)
+            self.send_header("Vary", "Accept-Encoding")
+            self.end_headers()
+            return None
+
+        encoding = asset.choose_encoding(self.headers.get("Accept-Encoding", ''))
+        body = asset.encodings[encoding]
+        self.send_response(200)
+        self.send_header("Content-Type", self.guess_type(path))
+        self.send_header("Content-Length", str(len(body)))
+        if encoding != 'identity':
+            self.send_header("Content-Encoding", encoding)
+        self.send_header("ETag", asset.etag)
+        self.send_header("Last-Modified", self.date_time_string(asset.mtime // 10 ** 9))
+        self.send_header("Cache-Control", cache_control)
+        self.send_header("Vary", "Accept-Encoding")
+        self.end_headers()
+        return io.BytesIO(body)
+
+    def _etag_matches(self, etag: str) -> bool:
+        """
+        return whether the request's `If-None-Match` header matches the given ETag; weak
+        tags match too, as conditional GET requests use the weak comparison
+        """
+        header = self.headers.get("If-None-Match")
+        if header is None:
+            return False
+        tags = set()
+        for tag in header.split(','):
+            tag = tag.strip()
+            tags.add(tag[2:] if tag.startswith("W/") else tag)
+        return '*' in tags or etag in tags
+
+    def do_POST(self) -> None:
+        """
+        answer a request to the move API
+        """
+        if self.path.rstrip('/') != "/move":
+            self.send_error(404, "Not found")
+            return
+        header = self.headers.get("Content-Length")
+        if header is None:
+            self.send_error(411, "Content-Length required")
+            return
+        try:
+            length = int(header)
+            if length < 0:
+                raise ValueError(f"negative Content-Length {length}")
+        except ValueError as error:
+            self.send_error(400, str(error))
+            return
+        if length > MAX_REQUEST_BYTES:
+            self.send_error(413, "Request too large")
+            return
+
+        try:
+            reply = search_move(json.loads(self.rfile.read(length)))
+        except (ValueError, TypeError) as error:  # includes malformed JSON
+            self.send_error(400, str(error))
+            return
+
+        body = json.dumps(reply).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Cache-Control", "no-store")
+        self.end_headers()
+        self.wfile.write(body)
+
+        rates = cache_hit_rates()
+        if rates is not None:
+            self.log_message("position cache: %d probes, hit rate %.1f%% (%.1f%% from "
+                             "disk)", rates["probes"], 100 * rates["hit_rate"],
+                             100 * rates["disk_hit_rate"])
+
+
+def serve(port: int = PORT, open_browser: bool = True,
+          directory: Optional[str] = None, cache_path: Optional[str] = None) -> None:
+    """
+    compress the assets, then serve the game and the move API on the given port until
+    interrupted; the move API searches with the persistent position cache at
+    `cache_path`, if one is given
+    """
+    global _CACHE_PATH
+    _CACHE_PATH = cache_path
+    directory = directory or os.path.dirname(os.path.abspath(__file__))
+    saved = precompress(directory)
+    print(f"compressed {len(_ASSETS)} assets, saving {saved / 1024 / 1024:.1f} MiB "
+          f"with gzip{'' if brotli is None else ' (Brotli also available)'}")
+    handler = functools.partial(Handler, directory=directory)
+    with http.server.ThreadingHTTPServer(("", port), handler) as httpd:
+        print("serving at port", port)
+        if open_browser:
+            webbrowser.open_new_tab(f"http://127.0.0.1:{port}")
         httpd.serve_forever()
+
+
+def main() -> None:
+    """
+    run the server from the command line
+    """
+    parser = argparse.ArgumentParser(description="Serve the Tic Tac Toe game.")
+    parser.add_argument("--port", type=int, default=PORT,
+                        help=f"port to serve on (default {PORT})")
+    parser.add_argument("--no-browser", action="store_true",
+                        help="do not open the game in a browser tab")
+    parser.add_argument("--cache", nargs='?', const=pc.DEFAULT_PATH, default=None,
+                        metavar="PATH",
+                        help="keep the positions searched by the move API in a persistent "
+                             "cache file (default PATH cache/positions.sqlite3)")
+    args = parser.parse_args()
+    serve(args.port, not args.no_browser, cache_path=args.cache)
+
+
+if __name__ == '__main__':
+    main()
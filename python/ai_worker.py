@@ -0,0 +1,49 @@
+"""
+A Brython Web Worker that searches for the moves of the AI players, so that the page
+stays responsive while they think.
+
+The page sends the worker a JSON message for every AI move, with the role and game piece
+of the player, the game state (board, next player, move history and winning step length)
+and the previous move. The worker rebuilds the game state, asks its own player object for
+a move, and posts back a JSON message with the game piece, the cell number and the
+number of moves in the game it was searched for. Player objects are kept between
+messages, so that the AI players still reuse their game trees from one move to the next,
+unless the message asks for a new player.
+"""
+import json
+from browser import bind, self as worker
+
+# the page's modules are bundled in `brython_modules.js`, which only the page loads;
+# load the bundle here as well before importing them
+worker.importScripts(__BRYTHON__.brython_path + "brython_modules.js")
+import tictactoe as ttt
+
+# the player objects searched with so far, keyed by (role, piece)
+PLAYERS = {}
+
+
+def game_from_message(message: dict) -> ttt.GameState:
+    """
+    rebuild the game state sent in the given message
+    """
+    return ttt.GameState(message["board"], message["next_player"],
+                         list(message["move_history"]), message["win_len"])
+
+
+@bind(worker, "message")
+def ev_search_move(event) -> None:
+    """
+    search for the move of the AI player in the received message, and post it back
+    """
+    message = json.loads(event.data)
+    key = (message["role"], message["piece"])
+    if key not in PLAYERS or message.get("new_player"):
+        PLAYERS[key] = ttt.role_to_player(message["role"], message["piece"])
+
+    game = game_from_message(message)
+    piece, cell = PLAYERS[key].return_move(game, message["prev_move"])
+    worker.send(json.dumps({
+        "piece": piece,
+        "cell": cell,
+        "turn": len(game.move_history)
+    }))
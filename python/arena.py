@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+"""
+A headless arena that plays Tic Tac Toe games between two AI players, for checking
+engine changes over many games before they are deployed.
+
+Games are played on every requested board side length with every requested starting
+player, and are spread across a pool of worker processes. The arena prints a table of
+player 1's wins, draws and losses for each setting, the average time each player took
+per move, and the number of games played per second.
+
+Example:
+    python3 arena.py ai_hard ai_easy --games 50 --sides 3 4 --first p1 p2
+
+This script needs process pools, and only runs under CPython.
+"""
+from __future__ import annotations
+from typing import Optional
+import argparse
+import concurrent.futures
+import os
+import random
+import time
+import tictactoe as ttt
+
+
+def play_game(
+        side: int,
+        win_len: Optional[int],
+        p1_role: str,
+        p2_role: str,
+        p1_piece: str,
+        start_first: str,
+        seed: int,
+        time_budget: Optional[float] = None
+) -> tuple[Optional[str], list[float], list[float]]:
+    """
+    play a game between two AI players set up as by `tictactoe.init_game`, and return the
+    winning player ('p1', 'p2', or `None` for a tie) along with the time taken by each of
+    player 1 and player 2 for every one of their moves, in seconds
+
+    `seed` seeds the global random number generator and those of the players, so that
+    the game can be replayed (as long as no player stops on a time budget), and
+    `time_budget` overrides the time budget per move of the Minimax and Monte Carlo
+    players
+
+    >>> winner, p1_times, p2_times = play_game(3, None, "ai_hard", "ai_hard", 'x', 'p1', 0)
+    >>> winner is None, len(p1_times), len(p2_times)
+    (True, 5, 4)
+    """
+    random.seed(seed)
+    game, player1, player2 = ttt.init_game(side, p1_piece, start_first, p2_role,
+                                           p1_role=p1_role, win_len=win_len, seed=seed)
+    players = {'p1': player1, 'p2': player2}
+    if time_budget is not None:
+        for player in players.values():
+            if isinstance(player, ttt.AIMinimaxPlayer):
+                player.time_budget = time_budget
+            elif isinstance(player, ttt.AIMCTSPlayer):
+                player.time_budget = time_budget
+                player.playouts = None
+
+    times = {'p1': [], 'p2': []}
+    prev_move = None
+    while game.get_winning_piece() is None:
+        name = game.next_player
+        start = time.perf_counter()
+        piece, cell = players[name].return_move(game, prev_move)
+        times[name].append(time.perf_counter() - start)
+        game.place_piece(piece, cell)
+        prev_move = cell
+
+    winning_piece = game.get_winning_piece()
+    if winning_piece == "tie":
+        winner = None
+    else:
+        winner = 'p1' if winning_piece == p1_piece else 'p2'
+    return winner, times['p1'], times['p2']
+
+
+def run_arena(
+        p1_role: str,
+        p2_role: str,
+        games: int,
+        sides: list[int],
+        firsts: list[str],
+        win_len: Optional[int] = None,
+        p1_piece: str = 'x',
+        workers: Optional[int] = None,
+        seed: int = 0,
+        time_budget: Optional[float] = None
+) -> tuple[dict, float]:
+    """
+    play `games` games for every pair of board side length in `sides` and starting player
+    in `firsts` on a pool of `workers` processes (one per CPU by default), and return the
+    results along with the total time taken in seconds
+
+    the results map every (side, first) pair to a dictionary of the number of games won
+    by each player (keys 'p1' and 'p2') or tied (key `None`), and the move times of each
+    player (keys "p1_times" and "p2_times")
+    """
+    settings = [(side, first) for side in sides for first in firsts]
+    results = {setting: {'p1': 0, 'p2': 0, None: 0, "p1_times": [], "p2_times": []}
+               for setting in settings}
+
+    start = time.perf_counter()
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {}
+        for side, first in settings:
+            for idx in range(games):
+                future = executor.submit(play_game, side, win_len, p1_role, p2_role,
+                                         p1_piece, first, seed + idx, time_budget)
+                futures[future] = (side, first)
+        for future in concurrent.futures.as_completed(futures):
+            winner, p1_times, p2_times = future.result()
+            result = results[futures[future]]
+            result[winner] += 1
+            result["p1_times"].extend(p1_times)
+            result["p2_times"].extend(p2_times)
+    return results, time.perf_counter() - start
+
+
+def _mean_ms(times: list[float]) -> float:
+    """
+    return the mean of the given times in milliseconds, or 0 if there are none
+    """
+    return 1000 * sum(times) / len(times) if times else 0.0
+
+
+def format_results(results: dict, elapsed: float) -> str:
+    """
+    return the arena results as a table, one row per setting and a row of totals
+    """
+    header = f"{'side':>4} {'first':>5} {'games':>6} {'p1 win':>7} {'draw':>6} " \
+             f"{'p1 loss':>7} {'p1 ms/move':>11} {'p2 ms/move':>11}"
+    lines = [header, '-' * len(header)]
+    total = {'p1': 0, 'p2': 0, None: 0, "p1_times": [], "p2_times": []}
+    for (side, first), result in results.items():
+        played = result['p1'] + result['p2'] + result[None]
+        lines.append(f"{side:>4} {first:>5} {played:>6} {result['p1']:>7} "
+                     f"{result[None]:>6} {result['p2']:>7} "
+                     f"{_mean_ms(result['p1_times']):>11.2f} "
+                     f"{_mean_ms(result['p2_times']):>11.2f}")
+        for key in total:
+            total[key] += result[key]
+    played = total['p1'] + total['p2'] + total[None]
+    lines.append('-' * len(header))
+    lines.append(f"{'all':>4} {'':>5} {played:>6} {total['p1']:>7} {total[None]:>6} "
+                 f"{total['p2']:>7} {_mean_ms(total['p1_times']):>11.2f} "
+                 f"{_mean_ms(total['p2_times']):>11.2f}")
+    lines.append(f"Played {played} games in {elapsed:.2f}s "
+                 f"({played / elapsed if elapsed else 0:.2f} games/s)")
+    return '\n'.join(lines)
+
+
+def main() -> None:
+    """
+    run the arena from the command line
+    """
+    parser = argparse.ArgumentParser(description="Play AI-vs-AI Tic Tac Toe games.")
+    parser.add_argument("p1_role", choices=ttt.AI_ROLES, help="role of player 1")
+    parser.add_argument("p2_role", choices=ttt.AI_ROLES, help="role of player 2")
+    parser.add_argument("--games", type=int, default=10,
+                        help="games per board size and starting player (default 10)")
+    parser.add_argument("--sides", type=int, nargs='+', default=[3],
+                        help="board side lengths (default 3)")
+    parser.add_argument("--win-len", type=int, default=None,
+                        help="winning step length (default: the board side length)")
+    parser.add_argument("--first", nargs='+', default=['p1', 'p2'],
+                        choices=['p1', 'p2', 'nd'],
+                        help="starting players, 'nd' for random (default p1 p2)")
+    parser.add_argument("--p1-piece", choices=['x', 'o'], default='x',
+                        help="game piece of player 1 (default x)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(),
+                        help="worker processes (default: one per CPU)")
+    parser.add_argument("--seed", type=int, default=0,
+                        help="seed of the first game of every setting (default 0)")
+    parser.add_argument("--time-budget", type=float, default=None,
+                        help="seconds per move of the Minimax and Monte Carlo players "
+                             "(default: their own budgets)")
+    args = parser.parse_args()
+
+    print(f"{args.p1_role} (p1, {args.p1_piece}) vs {args.p2_role} "
+          f"(p2, {ttt.piece_not(args.p1_piece)}), {args.games} games per setting, "
+          f"{args.workers} workers")
+    results, elapsed = run_arena(args.p1_role, args.p2_role, args.games, args.sides,
+                                 args.first, args.win_len, args.p1_piece, args.workers,
+                                 args.seed, args.time_budget)
+    print(format_results(results, elapsed))
+
+
+if __name__ == '__main__':
+    main()
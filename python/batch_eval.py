@@ -0,0 +1,166 @@
+"""
+Vectorized evaluation of many Tic Tac Toe positions at once, for offline analysis.
+
+Positions are given either as an array of boards of shape (N, side, side), holding
+`EMPTY`, `X` or `O` in each cell (or '', 'x' and 'o'), or as arrays of packed 'x' and
+'o' bitboards (see `tictactoe.GameState.get_bitboards`). Every position is judged with
+the same winning lines as `tictactoe.GameState`, and scored the same way as a "hard"
+`tictactoe.AIMinimaxPlayer` scores the leaves of its search.
+
+This module needs NumPy, and only runs under CPython.
+"""
+from __future__ import annotations
+from typing import Optional
+import numpy as np
+import tictactoe as ttt
+
+# cell codes of a board array
+EMPTY = 0
+X = 1
+O = 2
+
+# winner codes returned by the evaluation functions
+NO_WINNER = 0
+X_WINS = 1
+O_WINS = 2
+TIE = 3
+
+# number of positions evaluated together, which bounds the memory used for large batches
+CHUNK_SIZE = 65536
+
+
+def line_matrix(side: int, win_len: Optional[int] = None) -> np.ndarray:
+    """
+    return the (cells, lines) incidence matrix of the winning lines of a board, with a 1
+    where a cell lies on a line; the lines are in the order of `tictactoe.win_masks`
+
+    >>> line_matrix(3).shape
+    (9, 8)
+    """
+    masks = ttt.win_masks(side, win_len)
+    cells = np.arange(side * side)
+    return np.array([[(mask >> int(cell)) & 1 for mask in masks] for cell in cells],
+                    dtype=np.int32)
+
+
+def _evaluate_planes(
+        x_plane: np.ndarray,
+        o_plane: np.ndarray,
+        side: int,
+        win_len: int
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    evaluate positions given as (N, cells) 0/1 occupancy planes of 'x' and 'o'
+    """
+    lines = line_matrix(side, win_len)
+    weights = np.array(ttt.open_line_weights(win_len), dtype=np.int64)
+    winners = np.empty(len(x_plane), dtype=np.int8)
+    scores = np.empty(len(x_plane), dtype=np.int64)
+
+    for start in range(0, len(x_plane), CHUNK_SIZE):
+        x_chunk = x_plane[start:start + CHUNK_SIZE]
+        o_chunk = o_plane[start:start + CHUNK_SIZE]
+        x_counts = x_chunk @ lines
+        o_counts = o_chunk @ lines
+        empties = side * side - x_chunk.sum(axis=1) - o_chunk.sum(axis=1)
+
+        # 'x' is checked first, like `GameState.get_winning_piece`
+        x_wins = (x_counts == win_len).any(axis=1)
+        o_wins = ~x_wins & (o_counts == win_len).any(axis=1)
+        ties = ~x_wins & ~o_wins & (empties == 0)
+        winner = np.full(len(x_chunk), NO_WINNER, dtype=np.int8)
+        winner[x_wins] = X_WINS
+        winner[o_wins] = O_WINS
+        winner[ties] = TIE
+
+        # open lines score, see `GameState.open_lines_score` and `open_lines_evaluator`
+        open_score = (np.where(o_counts == 0, weights[x_counts], 0)
+                      - np.where(x_counts == 0, weights[o_counts], 0)).sum(axis=1)
+        score = np.clip(open_score, 1 - ttt.WIN_SCORE, ttt.WIN_SCORE - 1)
+        score = np.where(x_wins, (empties + 1) * ttt.WIN_SCORE, score)
+        score = np.where(o_wins, -(empties + 1) * ttt.WIN_SCORE, score)
+        score = np.where(ties, 0, score)
+
+        winners[start:start + CHUNK_SIZE] = winner
+        scores[start:start + CHUNK_SIZE] = score
+
+    return winners, winners != NO_WINNER, scores
+
+
+def evaluate_boards(
+        boards: np.ndarray,
+        win_len: Optional[int] = None
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    evaluate an array of boards of shape (N, side, side), and return three arrays of
+    length N: the winner code of each board (`NO_WINNER`, `X_WINS`, `O_WINS` or `TIE`),
+    whether the game on each board is over, and each board's score from the point of
+    view of 'x'
+
+    `win_len` is the number of adjacent pieces needed to win, the side length by default
+
+    >>> boards = np.array([[['x', 'x', 'x'], ['o', 'o', ''], ['', '', '']],
+    ...                    [['x', 'o', ''], ['', 'x', ''], ['', '', 'o']]])
+    >>> winners, terminal, scores = evaluate_boards(boards)
+    >>> winners.tolist(), terminal.tolist(), (scores // ttt.WIN_SCORE).tolist()
+    ([1, 0], [True, False], [5, 0])
+    >>> int(scores[1]) == ttt.open_lines_evaluator(ttt.GameState(boards[1].tolist()))
+    True
+    """
+    boards = np.asarray(boards)
+    if boards.dtype.kind in 'UO':
+        boards = np.where(boards == 'x', X, np.where(boards == 'o', O, EMPTY))
+    if boards.ndim != 3 or boards.shape[1] != boards.shape[2]:
+        raise ValueError(f"[!] Boards of shape {boards.shape} are not (N, side, side).")
+    side = boards.shape[1]
+    win_len = side if win_len is None else win_len
+    cells = boards.reshape(len(boards), side * side)
+    return _evaluate_planes((cells == X).astype(np.int32), (cells == O).astype(np.int32),
+                            side, win_len)
+
+
+def evaluate_bitboards(
+        x_bits: np.ndarray,
+        o_bits: np.ndarray,
+        side: int,
+        win_len: Optional[int] = None
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    evaluate positions given as arrays of packed 'x' and 'o' bitboards on boards with
+    sidelength `side`; see `evaluate_boards` for the results
+
+    Preconditions:
+        - side <= 8, so that a bitboard fits in 64 bits; a `ValueError` is raised
+          otherwise
+
+    >>> game = ttt.GameState(ttt.empty_board(4), win_len=3)
+    >>> rng = np.random.default_rng(0)
+    >>> x_list, o_list, expected = [], [], []
+    >>> for _ in range(2000):
+    ...     if game.get_winning_piece():
+    ...         game = ttt.GameState(ttt.empty_board(4), win_len=3)
+    ...     piece = 'x' if game.next_player == 'p1' else 'o'
+    ...     cells = game.empty_cells
+    ...     game.place_piece(piece, cells[rng.integers(len(cells))])
+    ...     x_bits, o_bits = game.get_bitboards()
+    ...     x_list.append(x_bits)
+    ...     o_list.append(o_bits)
+    ...     expected.append(ttt.AIMinimaxPlayer('x', 'hard')._evaluate(game))
+    >>> _, _, scores = evaluate_bitboards(np.array(x_list, dtype=np.uint64),
+    ...                                   np.array(o_list, dtype=np.uint64), 4, 3)
+    >>> scores.tolist() == expected
+    True
+    """
+    if side > 8:
+        raise ValueError(f"[!] A side length {side} board does not fit in 64 bits.")
+    win_len = side if win_len is None else win_len
+    shifts = np.arange(side * side, dtype=np.uint64)
+    x_plane = (np.asarray(x_bits, dtype=np.uint64)[:, None] >> shifts) & np.uint64(1)
+    o_plane = (np.asarray(o_bits, dtype=np.uint64)[:, None] >> shifts) & np.uint64(1)
+    return _evaluate_planes(x_plane.astype(np.int32), o_plane.astype(np.int32),
+                            side, win_len)
+
+
+if __name__ == '__main__':
+    import doctest
+    doctest.testmod()
@@ -0,0 +1,264 @@
+#!/usr/bin/env python3
+"""
+A benchmark suite for the Tic Tac Toe search engine, with stored baselines.
+
+For every board side length in `SIDES` and every difficulty, the suite measures:
+    - the nodes searched per second by `AIMinimaxPlayer.return_move`, its time to move
+      (50th, 90th and 99th percentiles), and the total number of nodes it searches, over a
+      fixed corpus of positions; the node count shows how well the search prunes, apart
+      from the speed of the machine
+    - the peak memory of the player's game tree over a full game against `ai_random`
+    - the calls per second of `GameState.copy_and_place_piece` and
+      `GameState.get_winning_piece` over the same corpus
+
+Hard players search to the fixed depths in `HARD_DEPTHS` instead of their time budget,
+and without the tablebase, so that every run searches the same nodes. Every timing is
+the fastest of several runs, to keep out the noise of other processes. The results are
+saved to a JSON baseline file with `--save`, and compared with it otherwise: the run
+fails (exit status 1) when any metric is worse than its baseline by more than the
+threshold. Baselines are only comparable on the machine that recorded them.
+
+Example:
+    python3 benchmark.py --save      # record a baseline on this machine
+    python3 benchmark.py             # compare against it after a change
+"""
+from __future__ import annotations
+import argparse
+import json
+import os
+import random
+import sys
+import time
+import tictactoe as ttt
+
+# board side lengths and difficulties benchmarked
+SIDES = (3, 4, 5)
+DIFFICULTIES = ("easy", "hard")
+
+# search depth of the hard players, by board side length
+HARD_DEPTHS = {3: 9, 4: 4, 5: 3}
+
+# number of positions in the corpus of every board side length
+CORPUS_SIZE = 10
+
+# shortest time of a single run of the `GameState` benchmarks, in seconds
+MIN_RUN_TIME = 0.2
+
+# default location of the baseline file
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir,
+                             "benchmarks", "baseline.json")
+
+# default relative change of a metric, in the worse direction, counted as a regression
+THRESHOLD = 0.25
+
+# suffixes of the metrics for which a larger value is better; all others are better when
+# smaller
+HIGHER_IS_BETTER = ("nodes_per_sec", "calls_per_sec")
+
+
+def corpus(side: int) -> list[ttt.GameState]:
+    """
+    return the fixed corpus of positions for the given board side length: unfinished
+    games reached by random moves from generators seeded with the side length
+
+    >>> [len(game.move_history) for game in corpus(3)][:4]
+    [1, 1, 3, 3]
+    """
+    rng = random.Random(side)
+    positions = []
+    while len(positions) < CORPUS_SIZE:
+        game = ttt.GameState(ttt.empty_board(side))
+        for _ in range(rng.randint(0, side)):
+            piece = 'x' if game.next_player == 'p1' else 'o'
+            game.place_piece(piece, rng.choice(game.empty_cells))
+        if game.get_winning_piece() is None:
+            positions.append(game)
+    return positions
+
+
+def percentile(values: list[float], pct: float) -> float:
+    """
+    return the given percentile of the values, by the nearest-rank method
+
+    >>> percentile([4.0, 1.0, 3.0, 2.0], 50)
+    2.0
+    """
+    ordered = sorted(values)
+    rank = max(1, -(-len(ordered) * pct // 100))
+    return ordered[int(rank) - 1]
+
+
+def _new_player(piece: str, difficulty: str, side: int) -> ttt.AIMinimaxPlayer:
+    """
+    return a benchmarked player, which searches to a fixed depth
+    """
+    if difficulty == "hard":
+        return ttt.AIMinimaxPlayer(piece, difficulty, max_depth=HARD_DEPTHS[side],
+                                   use_tablebase=False)
+    return ttt.AIMinimaxPlayer(piece, difficulty)
+
+
+def bench_moves(side: int, difficulty: str, repeat: int) -> dict:
+    """
+    return the nodes per second, time to move percentiles and total nodes searched of
+    fresh players moving in every corpus position, keeping the fastest of `repeat` runs of
+    each position
+    """
+    times = []
+    nodes = 0
+    for game in corpus(side):
+        piece = 'x' if game.next_player == 'p1' else 'o'
+        prev_move = game.move_history[-1] if game.move_history else None
+        best = None
+        for _ in range(repeat):
+            player = _new_player(piece, difficulty, side)
+            start = time.perf_counter()
+            player.return_move(game, prev_move)
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        times.append(best)
+        nodes += player._nodes
+    return {
+        "nodes_per_sec": nodes / sum(times),
+        "move_p50_ms": 1000 * percentile(times, 50),
+        "move_p90_ms": 1000 * percentile(times, 90),
+        "move_p99_ms": 1000 * percentile(times, 99),
+        "nodes": nodes
+    }
+
+
+def bench_tree_memory(side: int, difficulty: str) -> dict:
+    """
+    return the peak memory of the game tree of a player over a full game against a
+    random player, measured at the end of each of its searches, before the tree is
+    re-rooted onto the move played and its other moves are released
+    """
+    random.seed(side)
+    game = ttt.GameState(ttt.empty_board(side))
+    player = _new_player('x', difficulty, side)
+    players = {'p1': player, 'p2': ttt.AIRandomPlayer('o')}
+    sizes = [0]
+    # the statistics are reported while the tree still holds the whole search
+    player.stats_callback = lambda stats: sizes.append(player._tree.size_in_bytes())
+    prev_move = None
+    while game.get_winning_piece() is None:
+        piece, cell = players[game.next_player].return_move(game, prev_move)
+        game.place_piece(piece, cell)
+        prev_move = cell
+    return {"tree_peak_kib": max(sizes) / 1024}
+
+
+def bench_game_state(side: int, repeat: int) -> dict:
+    """
+    return the calls per second of `copy_and_place_piece` and `get_winning_piece` over
+    the empty cells of the corpus positions, keeping the fastest of `repeat` runs that
+    each last at least `MIN_RUN_TIME` seconds
+    """
+    moves = []
+    for game in corpus(side):
+        piece = 'x' if game.next_player == 'p1' else 'o'
+        moves.extend((game, piece, cell) for cell in game.empty_cells)
+    rates = {}
+    for name in ("copy_and_place_piece", "get_winning_piece"):
+        best = 0.0
+        for _ in range(repeat):
+            calls = 0
+            start = time.perf_counter()
+            while time.perf_counter() - start < MIN_RUN_TIME:
+                if name == "copy_and_place_piece":
+                    for game, piece, cell in moves:
+                        game.copy_and_place_piece(piece, cell)
+                else:
+                    for game, _, _ in moves:
+                        game.get_winning_piece()
+                calls += len(moves)
+            best = max(best, calls / (time.perf_counter() - start))
+        rates[f"{name}_calls_per_sec"] = best
+    return rates
+
+
+def run_suite(repeat: int = 5) -> dict:
+    """
+    run every benchmark, and return a flat mapping from metric names to values
+    """
+    metrics = {}
+    for side in SIDES:
+        for difficulty in DIFFICULTIES:
+            prefix = f"{side}x{side}/{difficulty}/"
+            results = bench_moves(side, difficulty, repeat)
+            results.update(bench_tree_memory(side, difficulty))
+            for name, value in results.items():
+                metrics[prefix + name] = value
+        for name, value in bench_game_state(side, repeat).items():
+            metrics[f"{side}x{side}/{name}"] = value
+    return metrics
+
+
+def compare(metrics: dict, baseline: dict, threshold: float = THRESHOLD) -> list[str]:
+    """
+    return a description of every metric that is worse than its baseline value by more
+    than `threshold`, relative to the baseline
+
+    >>> compare({"a/nodes_per_sec": 80.0, "a/move_p50_ms": 1.0},
+    ...         {"a/nodes_per_sec": 100.0, "a/move_p50_ms": 1.0}, 0.1)
+    ['a/nodes_per_sec: 80 vs baseline 100 (-20.0%)']
+    """
+    regressions = []
+    for name, value in metrics.items():
+        base = baseline.get(name)
+        if not base:
+            continue
+        change = (value - base) / base
+        worse = -change if name.endswith(HIGHER_IS_BETTER) else change
+        if worse > threshold:
+            regressions.append(f"{name}: {value:.4g} vs baseline {base:.4g} "
+                               f"({change:+.1%})")
+    return regressions
+
+
+def main() -> None:
+    """
+    run the benchmark suite from the command line
+    """
+    parser = argparse.ArgumentParser(description="Benchmark the Tic Tac Toe engine.")
+    parser.add_argument("--baseline", default=BASELINE_PATH,
+                        help="baseline JSON file (default benchmarks/baseline.json)")
+    parser.add_argument("--save", action="store_true",
+                        help="save the results as the new baseline")
+    parser.add_argument("--threshold", type=float, default=THRESHOLD,
+                        help=f"relative change counted as a regression (default "
+                             f"{THRESHOLD})")
+    parser.add_argument("--repeat", type=int, default=5,
+                        help="runs of every timing, the fastest is kept (default 5)")
+    args = parser.parse_args()
+
+    metrics = run_suite(args.repeat)
+    baseline = None
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as file:
+            baseline = json.load(file)["metrics"]
+
+    for name, value in metrics.items():
+        base = '' if baseline is None or name not in baseline \
+            else f"  (baseline {baseline[name]:.4g})"
+        print(f"{name:<48} {value:>12.4g}{base}")
+
+    if args.save:
+        os.makedirs(os.path.dirname(os.path.abspath(args.baseline)), exist_ok=True)
+        with open(args.baseline, 'w') as file:
+            json.dump({"python": sys.version.split()[0], "metrics": metrics}, file,
+                      indent=2, sort_keys=True)
+        print(f"Saved baseline to {os.path.normpath(args.baseline)}")
+    elif baseline is None:
+        print(f"No baseline at {os.path.normpath(args.baseline)}; run with --save first")
+    else:
+        regressions = compare(metrics, baseline, args.threshold)
+        for regression in regressions:
+            print(f"[!] Regression: {regression}")
+        if regressions:
+            sys.exit(1)
+        print("No regressions.")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,262 @@
+#!/usr/bin/env python3
+"""
+Build a slim `assets/brython/brython_modules.js`, which bundles only the modules the
+game's browser scripts really import.
+
+The bundle is a Brython virtual file system: every module is stored as an entry of
+[extension, source, imports] (with an extra 1 for packages), and Brython looks modules
+up in it before asking the server for them. Starting from the scripts in
+`ENTRY_SCRIPTS`, the imports of every module are followed through the modules of this
+directory and of `brython_stdlib.js`. Unlike Brython's own `--modules` builder, imports
+that do not run when a module is imported are not followed, which keeps out most of the
+standard library:
+    - imports under `if __name__ == '__main__':`, such as the doctest runs
+    - imports inside functions, such as `tokenize.main`'s import of `argparse`; the
+      browser scripts must therefore not call functions that import modules outside the
+      bundle, unless the modules are listed in `EXTRA_MODULES`
+The modules in `CPYTHON_ONLY` are left out as well, and so are the modules built into
+`brython.js`, which are in neither place.
+
+Writing the bundle also stamps the version of the service worker's precache with a hash
+of the files it precaches, so that returning clients pick up the new files.
+
+Example:
+    python3 bundle.py            # rebuild the bundle and stamp the service worker
+    python3 bundle.py --list     # list the bundled modules and their sizes
+"""
+from __future__ import annotations
+from typing import Optional
+import argparse
+import ast
+import hashlib
+import json
+import os
+import re
+import time
+
+PYTHON_DIR = os.path.dirname(os.path.abspath(__file__))
+BRYTHON_DIR = os.path.join(PYTHON_DIR, os.pardir, "assets", "brython")
+SERVICE_WORKER = os.path.join(PYTHON_DIR, os.pardir, "service_worker.js")
+
+# the modules run as scripts by the browser: the page's script and the AI worker's
+ENTRY_SCRIPTS = ("interaction", "ai_worker")
+
+# the modules the browser scripts import inside functions, which are bundled along with
+# their imports even though they are not followed: `interaction.load_game_module`
+# imports the game module once the board has been drawn
+EXTRA_MODULES = ("tictactoe",)
+
+# the modules of this directory that only run under CPython, and are never imported in
+# the browser
+CPYTHON_ONLY = ("arena", "batch_eval", "benchmark", "bundle", "parallel_search",
+                "position_cache", "retrograde", "tablebase")
+
+
+def load_stdlib(path: str) -> dict:
+    """
+    return the modules of the Brython standard library file at the given path, as a
+    mapping from module names to their entries
+    """
+    with open(path, encoding="utf-8") as file:
+        content = file.read()
+    start = content.index("var scripts = ") + len("var scripts = ")
+    scripts, _ = json.JSONDecoder().raw_decode(content, start)
+    scripts.pop("$timestamp", None)
+    return scripts
+
+
+def load_user_modules(directory: str) -> dict:
+    """
+    return the modules in the given directory, as a mapping from module names to their
+    entries
+    """
+    modules = {}
+    for filename in sorted(os.listdir(directory)):
+        name, ext = os.path.splitext(filename)
+        if ext == ".py":
+            with open(os.path.join(directory, filename), encoding="utf-8") as file:
+                modules[name] = [ext, file.read(), []]
+    return modules
+
+
+def _is_main_guard(node: ast.AST) -> bool:
+    """
+    return whether the given node is an `if __name__ == '__main__':` statement
+    """
+    if not isinstance(node, ast.If) or not isinstance(node.test, ast.Compare):
+        return False
+    test = node.test
+    operands = [test.left] + test.comparators
+    return len(operands) == 2 and isinstance(test.ops[0], ast.Eq) \
+        and any(isinstance(op, ast.Name) and op.id == "__name__" for op in operands) \
+        and any(isinstance(op, ast.Constant) and op.value == "__main__"
+                for op in operands)
+
+
+def find_imports(source: str, package: str = "") -> Optional[list[str]]:
+    """
+    return the names of the modules the given source might import when it is imported,
+    including the packages of submodules; `package` is the package of the
+    module, against which relative imports are resolved
+
+    `None` is returned if the source cannot be parsed
+
+    >>> find_imports('''
+    ... import os.path
+    ... from . import util
+    ... def main():
+    ...     import argparse
+    ... if __name__ == '__main__':
+    ...     import doctest
+    ... ''', "pkg")
+    ['os', 'os.path', 'pkg', 'pkg.util']
+    """
+    try:
+        tree = ast.parse(source)
+    except SyntaxError:
+        return None
+
+    names = set()
+    stack = [tree]
+    while stack:
+        node = stack.pop()
+        if _is_main_guard(node):
+            stack.extend(node.orelse)
+            continue
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.Lambda)):
+            continue
+
+        if isinstance(node, ast.Import):
+            names.update(alias.name for alias in node.names)
+        elif isinstance(node, ast.ImportFrom):
+            base = node.module or ""
+            if node.level:
+                parts = package.split('.') if package else []
+                parts = parts[:len(parts) - (node.level - 1)]
+                base = '.'.join(parts + ([base] if base else []))
+            if base:
+                names.add(base)
+            # an imported name may be a submodule of the package
+            names.update(f"{base}.{alias.name}" if base else alias.name
+                         for alias in node.names if alias.name != '*')
+        stack.extend(ast.iter_child_nodes(node))
+
+    # the packages of every submodule are imported with it
+    for name in list(names):
+        parts = name.split('.')
+        names.update('.'.join(parts[:idx]) for idx in range(1, len(parts)))
+    return sorted(names)
+
+
+def collect_modules(entries: list[str], modules: dict,
+                    extras: tuple = ()) -> dict:
+    """
+    return the entries of the given modules (of the form `load_stdlib` returns) that the
+    entry scripts import, directly or not, with their lists of imports filled in; the
+    extra modules are bundled as if the entry scripts imported them
+    """
+    bundle = {}
+    pending = list(extras)
+    for name in entries:
+        pending.extend(find_imports(modules[name][1]) or [])
+
+    while pending:
+        name = pending.pop()
+        if name in bundle or name not in modules:
+            continue
+        entry = list(modules[name])
+        bundle[name] = entry
+        if entry[0] != ".py":
+            continue
+        is_package = len(entry) == 4
+        package = name if is_package else name.rpartition('.')[0]
+        imports = find_imports(entry[1], package)
+        if imports is None:
+            # keep the imports found by Brython for sources CPython cannot parse
+            imports = entry[2] or []
+        else:
+            entry[2] = [module for module in imports if module in modules]
+        pending.extend(imports)
+    # entry scripts are loaded by the page itself, and are not bundled
+    for name in entries:
+        bundle.pop(name, None)
+    return bundle
+
+
+def write_bundle(bundle: dict, path: str) -> None:
+    """
+    write the given module entries as a Brython virtual file system to the given path
+    """
+    timestamp = int(1000 * time.time())
+    scripts = {"$timestamp": timestamp}
+    scripts.update(sorted(bundle.items()))
+    with open(path, 'w', encoding="utf-8") as file:
+        file.write(f"__BRYTHON__.VFS_timestamp = {timestamp}\n")
+        file.write("__BRYTHON__.use_VFS = true\n")
+        file.write(f"var scripts = {json.dumps(scripts)}\n")
+        file.write("__BRYTHON__.update_VFS(scripts)\n")
+
+
+def stamp_service_worker(path: str) -> str:
+    """
+    set the version of the service worker's precache at the given path to a hash of the
+    files it precaches, so that clients install the new files only when they change, and
+    return the new version
+    """
+    with open(path, encoding="utf-8") as file:
+        content = file.read()
+    start = content.index('[', content.index("var urls_to_cache"))
+    urls = re.findall(r"'([^']*)'", content[start:content.index(']', start)])
+
+    digest = hashlib.sha1()
+    root = os.path.dirname(path)
+    for url in urls:
+        filename = url.split('?')[0]
+        if filename.endswith('/'):
+            filename += "index.html"
+        with open(os.path.join(root, filename), 'rb') as file:
+            digest.update(file.read())
+    version = f"pwa_cache_{digest.hexdigest()[:10]}"
+    content = re.sub(r"var PWA_CACHE = '[^']*';", f"var PWA_CACHE = '{version}';",
+                     content, count=1)
+    with open(path, 'w', encoding="utf-8") as file:
+        file.write(content)
+    return version
+
+
+def main() -> None:
+    """
+    build the bundle from the command line
+    """
+    parser = argparse.ArgumentParser(description="Build a slim Brython module bundle.")
+    parser.add_argument("--stdlib",
+                        default=os.path.join(BRYTHON_DIR, "brython_stdlib.js"),
+                        help="Brython standard library (default "
+                             "assets/brython/brython_stdlib.js)")
+    parser.add_argument("--output",
+                        default=os.path.join(BRYTHON_DIR, "brython_modules.js"),
+                        help="bundle to write (default "
+                             "assets/brython/brython_modules.js)")
+    parser.add_argument("--list", action="store_true",
+                        help="list the bundled modules instead of writing the bundle")
+    args = parser.parse_args()
+
+    modules = load_stdlib(args.stdlib)
+    modules.update(load_user_modules(PYTHON_DIR))
+    for name in CPYTHON_ONLY:
+        del modules[name]
+    bundle = collect_modules(list(ENTRY_SCRIPTS), modules, EXTRA_MODULES)
+
+    if args.list:
+        for name, entry in sorted(bundle.items()):
+            print(f"{name:<32} {len(entry[1]):>8}")
+    else:
+        write_bundle(bundle, args.output)
+        print(f"Bundled {len(bundle)} modules into {os.path.normpath(args.output)} "
+              f"({os.path.getsize(args.output) / 1024:.0f} KiB)")
+        version = stamp_service_worker(SERVICE_WORKER)
+        print(f"Stamped the service worker's precache as {version}")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,21 +1,42 @@
 from __future__ import annotations
 from typing import Optional, Any
+import math
+import sys
 
 
 class GameTree:
-    placement: Optional[str]
+    """
+    A node of a game tree, along with the subtrees below it.
+
+    The subtrees are indexed by the cell number of their placement, so a subtree is found
+    in constant time. Nodes use `__slots__` to keep large trees compact in memory.
+
+    Instance Attributes:
+        - cell: the cell number of the move made to reach this node, or `None` at the root
+        - is_x_move: whether the move made to reach this node was made by 'x'
+        - x_win_score: the Minimax score of this node, from the point of view of 'x'
+        - last_visit: a stamp of the last time a search visited this node; larger stamps
+          are more recent
+        - best_cell: the cell number of the best subtree found by the last search of this
+          node, which the next search tries first, or `None` if it has not been searched
+    """
+    __slots__ = ('cell', 'is_x_move', 'x_win_score', 'last_visit', 'best_cell',
+                 '_subtrees')
+    cell: Optional[int]
     is_x_move: bool
     x_win_score: int
+    last_visit: int
+    best_cell: Optional[int]
 
     # Private Instance Attributes:
     #  - _subtrees:
     #      the subtrees of this tree, which represent the game trees after a possible
-    #      placement by the current player
-    _subtrees: list
+    #      placement by the current player, keyed by the cell number of the placement
+    _subtrees: dict
 
     def __init__(
             self,
-            placement: Optional[str] = None,
+            cell: Optional[int] = None,
             is_x_move: bool = True,
             x_win_score: int = 0
     ) -> None:
@@ -23,41 +44,170 @@ class GameTree:
         initialize a new game tree
 
         >>> gt = GameTree()
-        >>> gt.placement is None
+        >>> gt.cell is None
         True
         >>> gt.is_x_move
         True
         >>> gt.x_win_score
         0
         """
-        self.placement = placement
+        self.cell = cell
         self.is_x_move = is_x_move
-        self._subtrees = []
+        self._subtrees = {}
         self.x_win_score = x_win_score
+        self.last_visit = 0
+        self.best_cell = None
 
     def get_subtrees(self) -> list:
         """
-        return all subtrees under the current game tree
+        return all subtrees under the current game tree, in the order they were added
         """
-        return self._subtrees
+        return list(self._subtrees.values())
 
-    def find_subtree_by_spot(self, spot: str) -> Any:
+    def find_subtree_by_cell(self, cell: int) -> Any:
         """
-        find a particular subtree whose node contains the given spot
+        find the subtree whose node contains the placement on the given cell number, or
+        return `None` if there is none
 
-        this is only a depth-1 enumeration of the subtrees of the given node, and not an
-        exhausive search in the entire game tree
+        >>> gt = GameTree()
+        >>> gt.add_subtree(GameTree(1, False, 0))
+        >>> gt.find_subtree_by_cell(1).cell
+        1
         """
-        for subtree in self._subtrees:
-            if subtree.placement == spot:
-                return subtree
-        return None
+        return self._subtrees.get(cell)
 
     def add_subtree(self, subtree: Any) -> None:
         """
         append the given subtree to the current game tree's list of subtrees
         """
-        self._subtrees.append(subtree)
+        self._subtrees[subtree.cell] = subtree
+
+    def move_to_front(self, cell: int) -> None:
+        """
+        reorder the subtrees so that the subtree on the given cell number comes first
+
+        >>> gt = GameTree()
+        >>> for cell in range(3):
+        ...     gt.add_subtree(GameTree(cell, False, 0))
+        >>> gt.move_to_front(2)
+        >>> [s.cell for s in gt.get_subtrees()]
+        [2, 0, 1]
+        """
+        first = self._subtrees.pop(cell)
+        rest = self._subtrees
+        self._subtrees = {cell: first}
+        self._subtrees.update(rest)
+
+    def reroot(self, cell: int) -> Any:
+        """
+        return the subtree on the given cell number as the new root, and release all of
+        its siblings, which can no longer be reached in the game; a new empty subtree is
+        returned if there is none on the cell
+
+        Preconditions:
+            - `cell` is a vacant cell of the game represented by this tree
+
+        >>> gt = GameTree()
+        >>> for cell in range(3):
+        ...     gt.add_subtree(GameTree(cell, False, cell))
+        >>> root = gt.reroot(1)
+        >>> root.x_win_score, gt.get_subtrees()
+        (1, [])
+        """
+        subtree = self._subtrees.pop(cell, None)
+        self._subtrees = {}
+        if subtree is None:
+            subtree = GameTree(cell, not self.is_x_move, 0)
+        return subtree
+
+    def count_nodes(self) -> int:
+        """
+        return the number of nodes in this game tree, including the root
+
+        >>> gt = GameTree()
+        >>> gt.add_subtree(GameTree(0, False, 0))
+        >>> gt.count_nodes()
+        2
+        """
+        count = 0
+        stack = [self]
+        while stack:
+            node = stack.pop()
+            count += 1
+            stack.extend(node._subtrees.values())
+        return count
+
+    def size_in_bytes(self) -> int:
+        """
+        return the approximate memory taken by the nodes of this game tree and their
+        subtree dictionaries, in bytes; the cell numbers and scores are not counted, since
+        they are mostly shared with other objects
+
+        >>> gt = GameTree()
+        >>> size = gt.size_in_bytes()
+        >>> gt.add_subtree(GameTree(0, False, 0))
+        >>> gt.size_in_bytes() > size
+        True
+        """
+        size = 0
+        stack = [self]
+        while stack:
+            node = stack.pop()
+            size += sys.getsizeof(node) + sys.getsizeof(node._subtrees)
+            stack.extend(node._subtrees.values())
+        return size
+
+    def evict(self, max_nodes: int) -> int:
+        """
+        release the least recently visited subtrees until this game tree has at most
+        `max_nodes` nodes, and return the number of nodes released; the root is always
+        kept
+
+        the subtrees of a node are released all together, never one by one, so that
+        every node keeps either all of its moves or none of them, and is expanded again
+        by the next search that reaches it
+
+        >>> gt = GameTree()
+        >>> for cell, stamps in [(0, (1, 7)), (1, (5, 6))]:
+        ...     subtree = GameTree(cell, False, 0)
+        ...     subtree.last_visit = 8 + cell
+        ...     for idx, stamp in enumerate(stamps):
+        ...         leaf = GameTree(idx + 2, True, 0)
+        ...         leaf.last_visit = stamp
+        ...         subtree.add_subtree(leaf)
+        ...     gt.add_subtree(subtree)
+        >>> gt.evict(6)  # the node visited at 1 goes, and so does its sibling
+        2
+        >>> [len(s.get_subtrees()) for s in gt.get_subtrees()]
+        [0, 2]
+        """
+        stamps = []
+        stack = [self]
+        while stack:
+            node = stack.pop()
+            for subtree in node._subtrees.values():
+                stamps.append(subtree.last_visit)
+                stack.append(subtree)
+        # the root counts as one of the kept nodes
+        if len(stamps) + 1 <= max_nodes:
+            return 0
+
+        # every node visited no later than the threshold stamp is released with its
+        # siblings and their subtrees, which leaves at most `max_nodes - 1` nodes below
+        # the root
+        stamps.sort()
+        threshold = stamps[len(stamps) - max_nodes] if max_nodes > 0 else float("inf")
+        released = 0
+        stack = [self]
+        while stack:
+            node = stack.pop()
+            subtrees = node._subtrees.values()
+            if any(subtree.last_visit <= threshold for subtree in subtrees):
+                released += node.count_nodes() - 1
+                node._subtrees = {}
+            else:
+                stack.extend(subtrees)
+        return released
 
     def __str__(self, depth: int = 0) -> str:
         """
@@ -65,16 +215,194 @@ class GameTree:
         """
         piece = 'x' if self.is_x_move else 'o'
         string = ('    ' * depth) + "  `---" + \
-            f"[{piece} -> ({self.placement})]:" + \
+            f"[{piece} -> ({self.cell})]:" + \
             f" {self.x_win_score} \n"
-        if self._subtrees == []:
+        if not self._subtrees:
             return string
         else:
-            for subtree in self._subtrees:
+            for subtree in self._subtrees.values():
                 string += subtree.__str__(depth + 1)
             return string
 
 
+class MCTSNode:
+    """
+    A node of a Monte Carlo search tree, along with the child nodes expanded below it.
+
+    Instance Attributes:
+        - cell: the cell number of the move made to reach this node, or `None` at the root
+        - is_x_move: whether the move made to reach this node was made by 'x'
+        - visits: the number of playouts that passed through this node
+        - x_reward: the total reward of those playouts for 'x': 1 for a win, 0.5 for a
+          tie and 0 for a loss
+        - untried: bitboard of the cells whose moves have not been expanded yet
+        - result: the reward for 'x' if the game is over at this node, or is proven to
+          end that way with perfect play from this node on; `None` otherwise
+    """
+    __slots__ = ('cell', 'is_x_move', 'visits', 'x_reward', 'untried', 'result',
+                 '_children')
+    cell: Optional[int]
+    is_x_move: bool
+    visits: int
+    x_reward: float
+    untried: int
+    result: Optional[float]
+
+    # Private Instance Attributes:
+    #  - _children: the expanded child nodes, keyed by the cell number of their move
+    _children: dict
+
+    def __init__(
+            self,
+            cell: Optional[int] = None,
+            is_x_move: bool = True,
+            untried: int = 0,
+            result: Optional[float] = None
+    ) -> None:
+        """
+        initialize a new node with no visits
+
+        >>> node = MCTSNode(4, True, 0b1011)
+        >>> node.visits, node.untried, node.get_children()
+        (0, 11, [])
+        """
+        self.cell = cell
+        self.is_x_move = is_x_move
+        self.visits = 0
+        self.x_reward = 0.0
+        self.untried = untried
+        self.result = result
+        self._children = {}
+
+    def get_children(self) -> list:
+        """
+        return the expanded child nodes, in the order they were expanded
+        """
+        return list(self._children.values())
+
+    def add_child(self, child: Any) -> None:
+        """
+        add the given node as the child of its move, which is no longer untried
+        """
+        self._children[child.cell] = child
+        self.untried &= ~(1 << child.cell)
+
+    def value(self) -> float:
+        """
+        return the mean reward of the playouts through this node for the player that
+        made the move to reach it
+
+        >>> node = MCTSNode(0, False)
+        >>> node.visits, node.x_reward = 4, 1.0
+        >>> node.value()
+        0.75
+        """
+        mean = self.x_reward / self.visits
+        return mean if self.is_x_move else 1 - mean
+
+    def select_child(self, exploration: float) -> Any:
+        """
+        return the child with the highest upper confidence bound (UCT) on its value,
+        where `exploration` weighs how much rarely visited children are favoured
+
+        Preconditions:
+            - every child has been visited at least once
+        """
+        log_visits = math.log(self.visits)
+        best = None
+        best_bound = -1.0
+        for child in self._children.values():
+            bound = child.value() + exploration * math.sqrt(log_visits / child.visits)
+            if bound > best_bound:
+                best = child
+                best_bound = bound
+        return best
+
+    def proven_value(self) -> Optional[float]:
+        """
+        return the proven reward of this node for the player that made the move to reach
+        it, or `None` if the node is not proven
+        """
+        if self.result is None:
+            return None
+        return self.result if self.is_x_move else 1 - self.result
+
+    def prove(self) -> bool:
+        """
+        mark this node as proven if the player to move has a child that is a proven win,
+        or if all of its moves are expanded and proven, in which case the player to move
+        gets the best of them; return whether this node is proven
+        """
+        if self.result is not None:
+            return True
+        best = None
+        unproven = self.untried != 0
+        for child in self._children.values():
+            value = child.proven_value()
+            if value is None:
+                unproven = True
+            elif value == 1.0:
+                self.result = child.result
+                return True
+            elif best is None or value > best.proven_value():
+                best = child
+        if unproven:
+            return False
+        self.result = best.result
+        return True
+
+    def best_child(self) -> Any:
+        """
+        return the child to play: a proven win if there is one, or else the child visited
+        by the most playouts among those not proven to lose, preferring the higher value
+        on ties; return `None` if no child has been expanded
+
+        >>> root = MCTSNode()
+        >>> for cell, visits in [(0, 3), (1, 5), (2, 5)]:
+        ...     child = MCTSNode(cell, True)
+        ...     child.visits, child.x_reward = visits, cell
+        ...     root.add_child(child)
+        >>> root.best_child().cell
+        2
+        >>> root.get_children()[2].result = 0.0  # proven to lose for 'x'
+        >>> root.best_child().cell
+        1
+        """
+        best = None
+        best_rank = None
+        for child in self._children.values():
+            value = child.proven_value()
+            rank = (value == 1.0, value != 0.0, child.visits, child.value())
+            if best is None or rank > best_rank:
+                best = child
+                best_rank = rank
+        return best
+
+    def reroot(self, cell: int, untried: int) -> Any:
+        """
+        return the child on the given cell number as the new root, and release all of its
+        siblings; a new node with the given untried moves is returned if the cell's move
+        has not been expanded
+        """
+        child = self._children.pop(cell, None)
+        self._children = {}
+        if child is None:
+            child = MCTSNode(cell, not self.is_x_move, untried)
+        return child
+
+    def count_nodes(self) -> int:
+        """
+        return the number of nodes in this tree, including the root
+        """
+        count = 0
+        stack = [self]
+        while stack:
+            node = stack.pop()
+            count += 1
+            stack.extend(node._children.values())
+        return count
+
+
 if __name__ == '__main__':
     import doctest
     doctest.testmod()
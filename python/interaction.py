@@ -1,6 +1,10 @@
 from browser import document as dom
-from browser import html, DOMEvent, window, timer
-import tictactoe as ttt
+from browser import html, DOMEvent, window, timer, worker, ajax
+import json
+
+# the game module, imported by `load_game_module` only once the board has been drawn,
+# since compiling it (along with `typing`) takes longer than anything else on the page
+ttt = None
 
 
 class ThemeColor:
@@ -19,13 +23,12 @@ class ThemeColor:
 # GLOBAL VARIABLES
 class Config:
     """
-    global configurations (a total of 8) to keep track of
+    global configurations (a total of 11) to keep track of
 
     Class Attributes:
         - BOARD_SIDE_LENGTH: the side length of the game board
         - WINNING_STEP_LEN: the number of adjacent pieces that will result in a win;
-          currently unused due to implementation complexity and timme constraint, will be
-          used in the future
+          resets to the board side length whenever the board is redrawn
         - PLAYER_1_PIECE: the game piece used by player 1, either 'x' or 'o'
         - START_FIRST: which player starts first, either 'p1' or 'p2'
         - PLAYER_2_ROLE: whether player 2 is another human or some kind of AI player
@@ -34,9 +37,17 @@ class Config:
           is human, is Theme green if player 2 is an AI
         - GAME_OBJS: a dictionary containing the game object as well as the two player
           objects; can be obtained by any function that needs it
+        - WIN_STATUS: whether the game has been won or tied
+        - AI_WORKER: the Web Worker that searches for the AI players' moves, or `None` if
+          the browser has no Web Workers, in which case the moves are searched on the
+          page itself
+        - MOVE_API: the URL of the move API of `main.py`, which searches for the moves of
+          the Minimax AI players natively; set to `None` once the API turns out to be
+          unreachable (e.g. when the game is served as static files), after which the
+          moves are searched in the browser
     """
     BOARD_SIDE_LENGTH: int = 3
-    WINNING_STEP_LEN: int = 3  # currently unused but can be used when extended
+    WINNING_STEP_LEN: int = 3
     PLAYER_1_PIECE: str = 'x'
     START_FIRST: str = "p1"  # p1 -> player 1; p2 -> player 2; nd -> not determined
     PLAYER_2_ROLE: str = "ai_easy"
@@ -44,6 +55,12 @@ class Config:
     PLAYER_2_COLOR: str = ThemeColor.green
     GAME_OBJS: dict = {}
     WIN_STATUS: bool = False
+    AI_WORKER: object = None
+    MOVE_API: str = "move"
+
+
+# seconds to wait for the move API before searching in the browser instead
+MOVE_API_TIMEOUT = 10
 
 
 def draw_board(table: html.TABLE, side: int) -> None:
@@ -54,7 +71,8 @@ def draw_board(table: html.TABLE, side: int) -> None:
     for i in range(side):
         tr = html.TR()
         for j in range(side):
-            td = html.TD(html.SPAN(Class="cell", name=f"{i}{j}"))
+            spot = cell_to_spot(i * side + j, side)
+            td = html.TD(html.SPAN(Class="cell", name=spot))
             tr.append(td)
         table.attach(tr)
 
@@ -77,6 +95,24 @@ def draw_board(table: html.TABLE, side: int) -> None:
     Config.WINNING_STEP_LEN = side
 
 
+def cell_to_spot(cell: int, side: int) -> str:
+    """
+    helper function to convert the number of a cell of a board with the given side length
+    to the "row_col" spot name of its cell on the game board UI; the game module only
+    knows cell numbers, and spot names are only used by the UI
+    """
+    return f"{cell // side}_{cell % side}"
+
+
+def spot_to_cell(spot: str, side: int) -> int:
+    """
+    helper function to convert the "row_col" spot name of a cell on the game board UI of
+    the given side length to its cell number
+    """
+    row, col = spot.split('_')
+    return int(row) * side + int(col)
+
+
 def switch_selection(
     selected: html.BUTTON,
     button_class: str,
@@ -125,14 +161,14 @@ def ev_board_size(event: DOMEvent) -> None:
     switch_selection(target, ".btn-len")
 
     # grab new side length and redraw board
-    new_side_len = int(target.name[-1])
+    new_side_len = int(target.name.split('_')[-1])
     draw_board(dom['board'], new_side_len)
 
     # disable or enable winning step buttons as necessary
     for b in dom.select('.btn-win'):
-        if int(b.name[-1]) > new_side_len:
+        if int(b.name.split('_')[-1]) > new_side_len:
             disable_button(b)
-        elif int(b.name[-1]) == new_side_len:
+        elif int(b.name.split('_')[-1]) == new_side_len:
             enable_button(b)
             b.attrs["style"] = f"background-color: {ThemeColor.sel};"
         else:
@@ -145,8 +181,6 @@ def ev_board_size(event: DOMEvent) -> None:
 
 def ev_win_step(event: DOMEvent) -> None:
     """
-    [!] this function is currently unused, but may be used in the future
-
     change the number of steps required to win the game based on the
     given button event; write the result into the configuration variable
     `Config.WINNING_STEP_LEN`
@@ -157,7 +191,7 @@ def ev_win_step(event: DOMEvent) -> None:
     switch_selection(target, ".btn-win")
 
     # grab new winning length and set the global variable
-    Config.WINNING_STEP_LEN = int(target.name[-1])
+    Config.WINNING_STEP_LEN = int(target.name.split('_')[-1])
 
     # log the change in the broswer console
     print(f"Set winning step length to: {Config.WINNING_STEP_LEN}")
@@ -284,10 +318,11 @@ def cell_click(event: DOMEvent) -> None:
     timer.set_timeout(ev_game_round, 0, event)
 
 
-def draw_piece(piece: str, spot: str):
+def draw_piece(piece: str, cell: int):
     """
-    helper function to draw a given game piece at the given spot on the game board UI
+    helper function to draw a given game piece at the given cell on the game board UI
     """
+    spot = cell_to_spot(cell, Config.BOARD_SIDE_LENGTH)
     for c in dom.select('.cell'):
         if c.attrs["name"] == spot:
             c.text = piece
@@ -304,7 +339,7 @@ def draw_piece(piece: str, spot: str):
                 c.attrs["style"] = f"color: {Config.PLAYER_2_COLOR};"
 
 
-def check_winner(game: ttt.GameState):
+def check_winner(game: "ttt.GameState"):
     """
     given the game state, check for winners;
     if a winner is found, announce it to the game status and set Config.WIN_STATUS to
@@ -350,30 +385,195 @@ def check_winner(game: ttt.GameState):
         """
 
 
-def ai_make_move(player: ttt.Player, game: ttt.GameState, prev_move: str) -> None:
+def show_thinking(thinking: bool) -> None:
+    """
+    helper function to show or clear the "thinking" state of the UI while an AI player
+    searches for its move; the board ignores clicks in this state
+    """
+    if thinking:
+        game = Config.GAME_OBJS["game"]
+        dom['game_status'].html = f"""
+            Player {game.next_player[-1]} is thinking...
+        """
+        dom['game_status'].classList.add("thinking")
+        dom['board'].classList.add("thinking")
+    else:
+        dom['game_status'].classList.remove("thinking")
+        dom['board'].classList.remove("thinking")
+
+
+def log_timing(label: str) -> None:
+    """
+    helper function to log the time since the page started loading under the given
+    label, in the browser console and as a performance mark for the browser's profiler
+    """
+    window.performance.mark(label)
+    print(f"[timing] {label}: {window.performance.now():.0f} ms")
+
+
+def load_game_module() -> None:
+    """
+    import the game module, unless it is already imported, and start the AI worker
+    """
+    global ttt
+    if ttt is not None:
+        return
+    import tictactoe
+    ttt = tictactoe
+    log_timing("game module loaded")
+    start_ai_worker()
+
+
+def ev_page_rendered(timestamp: float) -> None:
+    """
+    event function that responds to the first frame drawn after the page was set up, and
+    loads the game module right after it has been painted
+    """
+    log_timing("interactive")
+    timer.set_timeout(load_game_module, 0)
+
+
+def start_ai_worker() -> None:
+    """
+    start the Web Worker that searches for the AI players' moves, and bind its events;
+    leave `Config.AI_WORKER` as `None` if the browser cannot run it
+    """
+    if not hasattr(window, "Worker"):
+        print("Web Workers are not supported; AI moves will be searched on the page.")
+        return
+    Config.AI_WORKER = worker.Worker("ai_worker")
+    Config.AI_WORKER.bind("message", ev_ai_worker_move)
+    Config.AI_WORKER.bind("error", ev_ai_worker_error)
+
+
+def ev_ai_worker_move(event: DOMEvent) -> None:
+    """
+    event function that responds to a move posted back by the AI worker
+    """
+    reply = json.loads(event.data)
+    game = Config.GAME_OBJS["game"]
+
+    # ignore a move that was searched for an earlier turn
+    if reply["turn"] != len(game.move_history):
+        return
+    finish_ai_move(game, reply["piece"], reply["cell"])
+
+
+def ev_ai_worker_error(event: DOMEvent) -> None:
+    """
+    event function that responds to an error in the AI worker; the worker is dropped,
+    and the pending move and all later ones are searched on the page instead
+    """
+    print(f"AI worker failed ({event.message}); searching on the page instead.")
+    Config.AI_WORKER.terminate()
+    Config.AI_WORKER = None
+
+    game = Config.GAME_OBJS["game"]
+    prev_move = game.move_history[-1] if game.move_history else None
+    timer.set_timeout(search_in_browser, 0, Config.GAME_OBJS[game.next_player], game,
+                      prev_move)
+
+
+def finish_ai_move(game: "ttt.GameState", piece: str, cell: int) -> None:
+    """
+    helper function to place and draw the move found by an AI player, then check for
+    winners and schedule the next AI move
+    """
+    game.place_piece(piece, cell)
+    draw_piece(piece, cell)
+    show_thinking(False)
+    check_winner(game)
+    ai_move_if_not_won(game)
+
+
+def ai_make_move(player: "ttt.Player", game: "ttt.GameState", prev_move: int) -> None:
     """
     helper function to obtain the player's move, place the game piece, and draw it on the
     UI
+
+    the moves of the Minimax players are searched by the move API when it is reachable,
+    and all other moves in the browser; the UI shows the "thinking" state until the move
+    arrives
     """
-    piece, spot = player.return_move(game, prev_move)
-    game.place_piece(piece, spot)
-    draw_piece(piece, spot)
+    show_thinking(True)
+    # only player 2 can be an AI player in the UI
+    if Config.MOVE_API is None or Config.PLAYER_2_ROLE not in {"ai_easy", "ai_hard"}:
+        search_in_browser(player, game, prev_move)
+        return
+
+    def on_complete(request):
+        if request.status == 200:
+            reply = json.loads(request.text)
+            finish_ai_move(game, reply["piece"], reply["cell"])
+        else:
+            fall_back_to_browser(f"status {request.status}")
+
+    def on_timeout():
+        fall_back_to_browser("timed out")
+
+    def fall_back_to_browser(reason):
+        print(f"Move API unreachable ({reason}); searching in the browser instead.")
+        Config.MOVE_API = None
+        # the player's game tree has missed the moves found by the API, so search with a
+        # new player from now on
+        new_player = ttt.role_to_player(Config.PLAYER_2_ROLE, player.piece)
+        Config.GAME_OBJS[game.next_player] = new_player
+        search_in_browser(new_player, game, prev_move, new_player=True)
+
+    ajax.post(
+        Config.MOVE_API,
+        data=json.dumps({
+            "board": game.get_board(),
+            "next_player": game.next_player,
+            "piece": player.piece,
+            "difficulty": Config.PLAYER_2_ROLE[-4:],
+            "win_len": game.get_win_length(),
+            "move_history": game.move_history
+        }),
+        headers={"Content-Type": "application/json"},
+        timeout=MOVE_API_TIMEOUT,
+        oncomplete=on_complete,
+        ontimeout=on_timeout
+    )
 
 
-def ai_move_if_not_won(game: ttt.GameState) -> None:
+def search_in_browser(
+    player: "ttt.Player",
+    game: "ttt.GameState",
+    prev_move: int,
+    new_player: bool = False
+) -> None:
+    """
+    helper function to search for the player's move in the browser: by the AI worker
+    when there is one, or on the page otherwise; `new_player` tells the worker to search
+    with a new player object instead of the one it has kept so far
+    """
+    if Config.AI_WORKER is None:
+        piece, cell = player.return_move(game, prev_move)
+        finish_ai_move(game, piece, cell)
+        return
+
+    Config.AI_WORKER.send(json.dumps({
+        "role": Config.PLAYER_2_ROLE,
+        "piece": player.piece,
+        "board": game.get_board(),
+        "next_player": game.next_player,
+        "move_history": game.move_history,
+        "win_len": game.get_win_length(),
+        "prev_move": prev_move,
+        "new_player": new_player
+    }))
+
+
+def ai_move_if_not_won(game: "ttt.GameState") -> None:
     """
     schedule the next AI move if the game is not won and the next player is not human
     """
     if not Config.WIN_STATUS:
         player_next = Config.GAME_OBJS[game.next_player]
         if player_next != "human":
-            # obtain the player's move, place the game piece, and draw it on the UI
-            dom['game_status'].text = dom['game_status'].text + ".."
             timer.set_timeout(ai_make_move, 0, player_next, game, game.move_history[-1])
 
-        # check for winners again
-        timer.set_timeout(check_winner, 0, game)
-
 
 def ev_game_round(event: DOMEvent) -> None:
     """
@@ -389,26 +589,25 @@ def ev_game_round(event: DOMEvent) -> None:
     # use the check winner function to show which player's turn it is
     check_winner(game)
 
-    # when we start a fresh game and AI starts first
+    # when we start a fresh game and AI starts first, obtain the player's move; the
+    # rest of the game round follows once the move has been placed
     if target.attrs['name'] == "start" and player != "human":
-        # obtain the player's move, place the game piece, and draw it on the UI
-        dom['game_status'].text = dom['game_status'].text + ".."
         timer.set_timeout(ai_make_move, 0, player, game, None)
 
     # when getting called by a human player, place the piece for the human
     elif "cell" in target.classList:
-        spot = target.attrs['name']
+        cell = spot_to_cell(target.attrs['name'], game.get_side_length())
         if game.next_player == "p1":
             piece = Config.PLAYER_1_PIECE
         else:
             piece = ttt.piece_not(Config.PLAYER_1_PIECE)
-        game.place_piece(piece, spot)
+        game.place_piece(piece, cell)
 
-    # check for winners and announce who's turn
-    timer.set_timeout(check_winner, 0, game)
+        # check for winners and announce who's turn
+        timer.set_timeout(check_winner, 0, game)
 
-    # make the next move if the game is not won and the next player is not human
-    timer.set_timeout(ai_move_if_not_won, 0, game)
+        # make the next move if the game is not won and the next player is not human
+        timer.set_timeout(ai_move_if_not_won, 0, game)
 
 
 def ev_start_game(event: DOMEvent) -> None:
@@ -418,13 +617,18 @@ def ev_start_game(event: DOMEvent) -> None:
     # log the start of the game in the browser console
     print("Game started.")
 
+    # the game module is loaded right after the page is rendered, unless the game is
+    # started even sooner
+    load_game_module()
+
     # initialize the game by calling the initializer in the tictactoe module
     game, p1, p2 = ttt.init_game(
         Config.BOARD_SIDE_LENGTH,
         Config.PLAYER_1_PIECE,
         Config.START_FIRST,
         Config.PLAYER_2_ROLE,
-        p1_role="human"
+        p1_role="human",
+        win_len=Config.WINNING_STEP_LEN
     )
 
     # update the game objects store according to the newly initialized game
@@ -473,8 +677,8 @@ if __name__ == '__main__':
     # bind functions to buttons
     for b in dom.select('.btn-len'):
         b.bind("click", ev_board_size)
-    # for b in dom.select('.btn-win'):
-    #     b.bind("click", ev_win_step)
+    for b in dom.select('.btn-win'):
+        b.bind("click", ev_win_step)
     for b in dom.select('.btn-piece'):
         b.bind("click", ev_player1_piece)
     for b in dom.select('.btn-st'):
@@ -482,3 +686,6 @@ if __name__ == '__main__':
     dom["player_2_role"].bind("change", ev_player_2_role)
     dom["btn_start"].bind("click", ev_start_game)
     dom["btn_reset"].bind("click", ev_reset_game)
+
+    # load the game module and start the AI worker once the board has been painted
+    timer.request_animation_frame(ev_page_rendered)
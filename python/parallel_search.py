@@ -0,0 +1,140 @@
+"""
+Process pools for the root-parallel search of `tictactoe.AIMinimaxPlayer`.
+
+The subtrees of a search root are handed out to the worker processes of a pool, one
+subtree per task. Each pool shares one bound between its tasks: the best score found so
+far for the piece at the root. A task reads the bound once, when it starts its subtree,
+and raises it when it finishes with a better exact score, so that the subtrees started
+after it are searched within a narrower window; a subtree already being searched keeps
+the window it started with, which its result is checked against at the root.
+
+Every worker process keeps its own searcher, with its own transposition table, for each
+kind of player it searches for; the evaluator of the player must therefore be picklable
+(a module-level function).
+
+This module needs process pools, and only runs under CPython.
+"""
+from __future__ import annotations
+from typing import Any, Optional, Callable
+import concurrent.futures
+import multiprocessing
+import threading
+import time
+import tictactoe as ttt
+
+# the pool of every worker count used so far, shared by all players of the process, as a
+# tuple of (executor, shared bound, lock held while a search uses the pool)
+_POOLS = {}
+_POOLS_LOCK = threading.Lock()
+
+# state of a worker process: the bound shared with the other workers of its pool, and its
+# searchers by (piece, difficulty, evaluator, board side length, winning step length), so
+# that games with different winning lines never share a transposition table
+_shared_bound = None
+_SEARCHERS = {}
+
+
+def _init_worker(bound: Any) -> None:
+    """
+    set up a new worker process of a pool
+    """
+    global _shared_bound
+    _shared_bound = bound
+
+
+def _get_pool(workers: int) -> tuple:
+    """
+    return the pool with the given number of workers, creating it on first use
+    """
+    with _POOLS_LOCK:
+        if workers not in _POOLS:
+            bound = multiprocessing.Value('q', 0)
+            executor = concurrent.futures.ProcessPoolExecutor(
+                max_workers=workers, initializer=_init_worker, initargs=(bound,))
+            _POOLS[workers] = (executor, bound, threading.Lock())
+        return _POOLS[workers]
+
+
+def _search_task(
+        settings: tuple[str, str, Callable],
+        game: ttt.GameState,
+        cell: int,
+        depth: int,
+        clock: int,
+        deadline: Optional[float],
+        node_budget: Optional[int],
+        max_nodes: int
+) -> tuple[Any, int, int]:
+    """
+    search the subtree of a move by the piece at the root, within the window bounded by
+    the shared bound, and return the searched subtree (trimmed to `max_nodes` nodes), the
+    bound it was searched with and the number of nodes searched
+
+    the subtree is merged into the game tree of the player at the root, so it is trimmed
+    by `GameTree.evict`, which releases the subtrees of a node all together: a node
+    searched again later either has all of its moves or is expanded anew
+    """
+    key = settings + (game.get_side_length(), game.get_win_length())
+    if key not in _SEARCHERS:
+        piece, difficulty, evaluator = settings
+        _SEARCHERS[key] = ttt.AIMinimaxPlayer(piece, difficulty, evaluator=evaluator,
+                                              use_tablebase=False)
+    searcher = _SEARCHERS[key]
+    maximize = searcher.is_x
+
+    bound = _shared_bound.value
+    if maximize:
+        alpha, beta = bound, float("inf")
+    else:
+        alpha, beta = float("-inf"), bound
+    time_budget = None if deadline is None else deadline - time.time()
+    subtree, nodes = searcher.search_move(game, cell, depth, alpha, beta, clock,
+                                          time_budget, node_budget)
+
+    # a score beyond the bound is exact, and becomes the bound of the tasks started from
+    # now on if it is the best yet
+    score = subtree.x_win_score
+    with _shared_bound.get_lock():
+        if (score > _shared_bound.value) if maximize else (score < _shared_bound.value):
+            _shared_bound.value = score
+
+    # trim the subtree before it is sent back, releasing whole sets of subtrees only
+    subtree.evict(max_nodes)
+    return subtree, bound, nodes
+
+
+def search_subtrees(
+        workers: int,
+        settings: tuple[str, str, Callable],
+        game: ttt.GameState,
+        cells: list[int],
+        depth: int,
+        bound: int,
+        clock: int,
+        deadline: Optional[float] = None,
+        node_budget: Optional[int] = None,
+        max_nodes: int = ttt.MAX_TREE_NODES
+) -> list[tuple[Any, int, int]]:
+    """
+    search the subtrees of the given root moves on a pool of `workers` processes, and
+    return, in the order of `cells`, the searched subtree, the bound it was searched with
+    and the number of nodes searched of each move
+
+    `settings` is the (piece, difficulty, evaluator) of the player at the root, `bound`
+    the best score found so far at the root, and `deadline` the `time.time` at which the
+    search must stop; `tictactoe.SearchTimeout` is raised if a worker runs out of budget
+    """
+    executor, shared_bound, lock = _get_pool(workers)
+    with lock:
+        shared_bound.value = bound
+        futures = [executor.submit(_search_task, settings, game, cell, depth, clock,
+                                   deadline, node_budget, max_nodes)
+                   for cell in cells]
+        try:
+            return [future.result() for future in futures]
+        finally:
+            # drop the tasks not started yet, and let the running ones stop before the
+            # shared bound can be reused by another search
+            for future in futures:
+                future.cancel()
+            concurrent.futures.wait(futures)
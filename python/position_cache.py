@@ -0,0 +1,352 @@
+#!/usr/bin/env python3
+"""
+A persistent position cache: a transposition table backed by an SQLite file, so that the
+positions searched by one game, server run or process are reused by all later ones.
+
+Every result is stored under a namespace and the `GameState.canonical_key` of its
+position, along with the depth it was searched to and its bound flag (see
+`transposition.py`), exactly as in the in-memory table. Scores depend on the board, the
+winning step length, the evaluator and the scoring scheme, so each kind of player has
+its own namespace for each `tictactoe.SCORE_VERSION` (see `namespace`); the results of
+older scoring schemes are ignored, and can be deleted with `--prune`. A lookup first
+probes the in-memory table, then the file; results read from the file are kept in
+memory, and new results are written to the file in batches.
+
+The file is opened in write-ahead log mode, so any number of processes and threads can
+read it while one of them writes; every thread uses its own connection. A stored result
+is only replaced by a result searched at least as deep.
+
+Example:
+    python3 position_cache.py                    # show what the cache file holds
+    python3 position_cache.py --measure 4 hard   # measure the warm-start benefit
+    python3 position_cache.py --prune            # delete the results of old scores
+
+This module needs SQLite, and only runs under CPython.
+"""
+from __future__ import annotations
+from typing import Optional
+import argparse
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+import tictactoe as ttt
+import transposition as tp
+
+# default location of the cache file
+DEFAULT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir,
+                            "cache", "positions.sqlite3")
+
+# number of new results buffered in memory before they are written to the file
+FLUSH_INTERVAL = 4096
+
+# seconds a connection waits for another process's write to finish
+BUSY_TIMEOUT = 30.0
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS positions (
+    namespace TEXT NOT NULL,
+    key INTEGER NOT NULL,
+    score INTEGER NOT NULL,
+    depth INTEGER NOT NULL,
+    flag INTEGER NOT NULL,
+    PRIMARY KEY (namespace, key)
+) WITHOUT ROWID
+"""
+
+UPSERT = """
+INSERT INTO positions (namespace, key, score, depth, flag) VALUES (?, ?, ?, ?, ?)
+ON CONFLICT (namespace, key) DO UPDATE
+SET score = excluded.score, depth = excluded.depth, flag = excluded.flag
+WHERE excluded.depth >= positions.depth
+"""
+
+
+def namespace(difficulty: str, side: int, win_len: int) -> str:
+    """
+    return the namespace of the results searched by players of the given difficulty on
+    boards with the given side length and winning step length, under the current
+    scoring scheme
+
+    >>> namespace("hard", 4, 3) == f"v{ttt.SCORE_VERSION}/hard/4x4/3"
+    True
+    """
+    return f"v{ttt.SCORE_VERSION}/{difficulty}/{side}x{side}/{win_len}"
+
+
+def _signed(key: int) -> int:
+    """
+    return the given 64-bit key as a signed integer, which is what SQLite stores
+
+    >>> _signed(2 ** 64 - 1), _signed(5)
+    (-1, 5)
+    """
+    return key - (1 << 64) if key >= 1 << 63 else key
+
+
+class PersistentTable(tp.TranspositionTable):
+    """
+    A transposition table that reads and writes through to a shared SQLite file.
+
+    Instance Attributes:
+        - path: the cache file
+        - namespace: the namespace of the results of this table in the file
+        - probes: the number of lookups so far
+        - memory_hits: the number of lookups found in the in-memory table
+        - disk_hits: the number of lookups found in the file only
+
+    >>> path = os.path.join(tempfile.mkdtemp(), "cache.sqlite3")
+    >>> table = PersistentTable(path, "test")
+    >>> table.store(key=2 ** 64 - 1, score=3, depth=2, flag=tp.EXACT)
+    >>> table.close()
+    >>> table = PersistentTable(path, "test")
+    >>> table.probe(2 ** 64 - 1), table.probe(7)
+    ((3, 2, 0), None)
+    >>> table.hit_rates()["disk_hit_rate"]
+    0.5
+    >>> table.close()
+    """
+    path: str
+    namespace: str
+    probes: int
+    memory_hits: int
+    disk_hits: int
+
+    # Private Instance Attributes:
+    #   - _local: per-thread storage of the connections to the file
+    #   - _pending: the results not written to the file yet, keyed by their keys
+    #   - _lock: lock of `_pending`, held while it is written to the file
+    #   - _flush_interval: the number of pending results that triggers a write
+    _local: threading.local
+    _pending: dict
+    _lock: threading.Lock
+    _flush_interval: int
+
+    def __init__(self, path: str = DEFAULT_PATH, namespace: str = '',
+                 capacity: Optional[int] = None, max_bytes: int = tp.DEFAULT_MAX_BYTES,
+                 flush_interval: int = FLUSH_INTERVAL) -> None:
+        """
+        initialize the table on the cache file at the given path, which is created if it
+        does not exist; see `TranspositionTable` for `capacity` and `max_bytes`
+        """
+        super().__init__(capacity, max_bytes)
+        self.path = path
+        self.namespace = namespace
+        self.probes = 0
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self._local = threading.local()
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._flush_interval = flush_interval
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        connection = self._connection()
+        with connection:
+            connection.execute(SCHEMA)
+
+    def _connection(self) -> sqlite3.Connection:
+        """
+        return the connection of the current thread to the cache file, opening it on
+        first use
+        """
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=BUSY_TIMEOUT,
+                                         isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+        return connection
+
+    def probe(self, key: int) -> Optional[tuple]:
+        """
+        return the (score, depth, flag) stored for the given key in memory or in the
+        file, or `None` if the key is in neither
+        """
+        self.probes += 1
+        entry = super().probe(key)
+        if entry is not None:
+            self.memory_hits += 1
+            return entry
+        row = self._connection().execute(
+            "SELECT score, depth, flag FROM positions WHERE namespace = ? AND key = ?",
+            (self.namespace, _signed(key))
+        ).fetchone()
+        if row is None:
+            return None
+        self.disk_hits += 1
+        super().store(key, *row)
+        return row
+
+    def store(self, key: int, score: int, depth: int, flag: int) -> None:
+        """
+        store a search result for the given key in memory, and queue it to be written
+        to the file
+        """
+        super().store(key, score, depth, flag)
+        with self._lock:
+            pending = self._pending.get(key)
+            if pending is None or depth >= pending[1]:
+                self._pending[key] = (score, depth, flag)
+            full = len(self._pending) >= self._flush_interval
+        if full:
+            self.flush()
+
+    def new_search(self) -> None:
+        """
+        mark the start of a new search, and write the results of the previous searches
+        to the file
+        """
+        super().new_search()
+        self.flush()
+
+    def flush(self) -> None:
+        """
+        write all pending results to the file, in one transaction
+        """
+        with self._lock:
+            if not self._pending:
+                return
+            rows = [(self.namespace, _signed(key), score, depth, flag)
+                    for key, (score, depth, flag) in self._pending.items()]
+            connection = self._connection()
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                connection.executemany(UPSERT, rows)
+            except BaseException:
+                connection.execute("ROLLBACK")
+                raise
+            connection.execute("COMMIT")
+            self._pending.clear()
+
+    def close(self) -> None:
+        """
+        write the pending results, and close the connection of the current thread
+        """
+        self.flush()
+        connection = getattr(self._local, "connection", None)
+        if connection is not None:
+            connection.close()
+            self._local.connection = None
+
+    def hit_rates(self) -> dict:
+        """
+        return the number of lookups so far, along with the share of them found in
+        memory, in the file, and in either
+        """
+        probes = self.probes or 1
+        return {
+            "probes": self.probes,
+            "memory_hit_rate": self.memory_hits / probes,
+            "disk_hit_rate": self.disk_hits / probes,
+            "hit_rate": (self.memory_hits + self.disk_hits) / probes
+        }
+
+
+def describe(path: str) -> list[tuple[str, int, int, int]]:
+    """
+    return the namespace, number of results, number of exact results and deepest search
+    depth of every namespace in the cache file at the given path
+    """
+    connection = sqlite3.connect(path, timeout=BUSY_TIMEOUT)
+    try:
+        return connection.execute(
+            "SELECT namespace, COUNT(*), SUM(flag = ?), MAX(depth) FROM positions "
+            "GROUP BY namespace ORDER BY namespace", (tp.EXACT,)
+        ).fetchall()
+    finally:
+        connection.close()
+
+
+def prune(path: str) -> int:
+    """
+    delete the results stored under the scoring schemes other than the current one from
+    the cache file at the given path, and return the number of results deleted
+
+    >>> path = os.path.join(tempfile.mkdtemp(), "cache.sqlite3")
+    >>> table = PersistentTable(path, "hard/4x4/4")  # a namespace of the first scheme
+    >>> table.store(key=1, score=3, depth=2, flag=tp.EXACT)
+    >>> table.close()
+    >>> table = PersistentTable(path, namespace("hard", 4, 4))
+    >>> table.store(key=1, score=4, depth=2, flag=tp.EXACT)
+    >>> table.close()
+    >>> prune(path), [row[0] for row in describe(path)] == [namespace("hard", 4, 4)]
+    (1, True)
+    """
+    connection = sqlite3.connect(path, timeout=BUSY_TIMEOUT, isolation_level=None)
+    try:
+        cursor = connection.execute("DELETE FROM positions WHERE namespace NOT LIKE ?",
+                                    (f"v{ttt.SCORE_VERSION}/%",))
+        return cursor.rowcount
+    finally:
+        connection.close()
+
+
+def measure_warm_start(side: int, difficulty: str, path: str) -> list[dict]:
+    """
+    search the moves of the benchmark corpus of the given board side length twice, each
+    time with a new player and a new table on the cache file at the given path, and
+    return the nodes searched, time taken and hit rates of both runs; the first run is
+    cold if the file is new, and the second is warmed by the first
+    """
+    import benchmark
+
+    max_depth = benchmark.HARD_DEPTHS.get(side) if difficulty == "hard" else None
+    runs = []
+    for _ in range(2):
+        table = PersistentTable(path, namespace(difficulty, side, side))
+        nodes = 0
+        start = time.perf_counter()
+        for game in benchmark.corpus(side):
+            piece = 'x' if game.next_player == 'p1' else 'o'
+            prev_move = game.move_history[-1] if game.move_history else None
+            player = ttt.AIMinimaxPlayer(piece, difficulty, table, max_depth=max_depth,
+                                         use_tablebase=False, collect_stats=True)
+            player.return_move(game, prev_move)
+            nodes += player.last_stats.nodes
+        elapsed = time.perf_counter() - start
+        table.close()
+        runs.append(dict(table.hit_rates(), nodes=nodes, elapsed=elapsed))
+    return runs
+
+
+def main() -> None:
+    """
+    describe the cache file, measure the warm-start benefit or delete the results of
+    older scoring schemes, from the command line
+    """
+    parser = argparse.ArgumentParser(description="Inspect the persistent position cache.")
+    parser.add_argument("--path", default=DEFAULT_PATH,
+                        help="cache file (default cache/positions.sqlite3)")
+    parser.add_argument("--measure", nargs=2, metavar=("SIDE", "DIFFICULTY"),
+                        help="search the benchmark corpus cold and then warm, with a new "
+                             "cache file")
+    parser.add_argument("--prune", action="store_true",
+                        help="delete the results stored under older scoring schemes")
+    args = parser.parse_args()
+
+    if args.measure:
+        side, difficulty = int(args.measure[0]), args.measure[1]
+        with tempfile.TemporaryDirectory() as directory:
+            runs = measure_warm_start(side, difficulty,
+                                      os.path.join(directory, "positions.sqlite3"))
+        for label, run in zip(("cold", "warm"), runs):
+            print(f"{label}: {run['nodes']:>9} nodes in {run['elapsed']:.3f}s, "
+                  f"{run['probes']} probes, hit rate {run['hit_rate']:.1%} "
+                  f"({run['disk_hit_rate']:.1%} from disk)")
+        return
+
+    if not os.path.exists(args.path):
+        print(f"No cache at {os.path.normpath(args.path)}")
+        return
+    if args.prune:
+        print(f"Deleted {prune(args.path)} results of older scoring schemes")
+    print(f"{'namespace':<16} {'results':>9} {'exact':>9} {'max depth':>9}")
+    for name, count, exact, depth in describe(args.path):
+        print(f"{name:<16} {count:>9} {exact:>9} {depth:>9}")
+
+
+if __name__ == '__main__':
+    main()
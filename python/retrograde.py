@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+"""
+A retrograde solver that builds the exact sorted tablebases of boards larger than 3x3
+(see `tablebase.py`), 4x4 by default.
+
+The solver works on layers of positions with the same number of pieces, up to rotations
+and reflections (see `tablebase.canonical_code`), with either piece moving first:
+    - the forward pass enumerates every reachable position one layer at a time from the
+      empty board, scoring the positions that end the game as they are found
+    - the backward pass then goes through the layers from the fullest to the empty
+      board, scoring every other position from the scores of its successors in the next
+      layer: the best of them for the piece to move
+Both passes hand out the positions of a layer to a pool of worker processes in chunks.
+Each worker of the backward pass gets the scores of the next layer when it starts, which
+costs nothing where processes are forked.
+
+Example:
+    python3 retrograde.py                   # solve 4x4 into assets/tablebase/ttt4w4.bin
+    python3 retrograde.py --win-len 3       # solve 4x4 boards won by 3 in a row
+
+This module needs process pools, and only runs under CPython.
+"""
+from __future__ import annotations
+from typing import Optional
+import argparse
+import concurrent.futures
+import os
+import time
+import tablebase as tb
+import tictactoe as ttt
+
+# number of positions of a layer handed to a worker at a time
+CHUNK_SIZE = 20000
+
+# state of a worker process: the board of the positions it solves, as a tuple of (side
+# length, bitboard of all cells, winning masks, winning lines through each cell), and the
+# scores of the layer after the positions it scores
+_board = None
+_next_scores = None
+
+
+def _init_worker(side: int, win_len: int, next_scores: Optional[dict]) -> None:
+    """
+    set up a worker process solving the given board, scoring positions from the given
+    scores of the next layer
+    """
+    global _board, _next_scores
+    full = (1 << (side * side)) - 1
+    _board = (side, full, ttt.win_masks(side, win_len), ttt.cell_lines(side, win_len))
+    _next_scores = next_scores
+
+
+def _successors(code: int) -> list[tuple[int, Optional[int]]]:
+    """
+    return the canonical code of the position after every move of the given unfinished
+    position, along with its score if the move ends the game, or `None` otherwise
+    """
+    side, full, masks, lines = _board
+    board = code >> 1
+    x_bits, o_bits = board & full, board >> (side * side)
+    empty = full & ~(x_bits | o_bits)
+    num_empty = ttt.popcount(empty) - 1
+    win_score = num_empty + 1
+    successors = []
+    for cell in ttt.iter_cells(empty):
+        if code & 1:
+            new_o = o_bits | 1 << cell
+            score = -win_score if ttt._completes_line(new_o, cell, masks, lines) else None
+            child = tb.canonical_code(x_bits, new_o, 'x', side)
+        else:
+            new_x = x_bits | 1 << cell
+            score = win_score if ttt._completes_line(new_x, cell, masks, lines) else None
+            child = tb.canonical_code(new_x, o_bits, 'o', side)
+        if score is None and not num_empty:
+            score = 0
+        successors.append((child, score))
+    return successors
+
+
+def _expand(codes: list[int]) -> dict:
+    """
+    return the successors of the given unfinished positions, as a mapping from their
+    canonical codes to their scores if they end the game, or `None` otherwise
+    """
+    layer = {}
+    for code in codes:
+        layer.update(_successors(code))
+    return layer
+
+
+def _back_up(codes: list[int]) -> list[tuple[int, int]]:
+    """
+    return the given unfinished positions along with their scores: the best score of
+    their successors for the piece to move
+    """
+    scores = []
+    for code in codes:
+        child_scores = [_next_scores[child] for child, _ in _successors(code)]
+        scores.append((code, min(child_scores) if code & 1 else max(child_scores)))
+    return scores
+
+
+def _run(function, codes: list[int], side: int, win_len: int,
+         next_scores: Optional[dict], workers: int) -> list:
+    """
+    return the results of the given task function over the codes, split in chunks, on a
+    pool of `workers` processes, or in this process if `workers` is 1
+    """
+    chunks = [codes[idx:idx + CHUNK_SIZE] for idx in range(0, len(codes), CHUNK_SIZE)]
+    if workers == 1 or len(chunks) == 1:
+        _init_worker(side, win_len, next_scores)
+        return [function(chunk) for chunk in chunks]
+    with concurrent.futures.ProcessPoolExecutor(
+            max_workers=workers, initializer=_init_worker,
+            initargs=(side, win_len, next_scores)) as executor:
+        return list(executor.map(function, chunks))
+
+
+def solve(side: int, win_len: Optional[int] = None, workers: int = 1,
+          verbose: bool = False) -> dict:
+    """
+    solve every position reachable from the empty board with either piece moving first,
+    on `workers` processes, and return a mapping from the canonical codes of the
+    positions to their exact scores
+
+    >>> scores = solve(3)
+    >>> len(scores), scores[tb.canonical_code(0, 0, 'x', 3)]
+    (1530, 0)
+    >>> scores[tb.canonical_code(0b000010001, 0b000100100, 'x', 3)]  # x wins next move
+    5
+    """
+    win_len = win_len or side
+    cells = side * side
+    empty_board = {tb.canonical_code(0, 0, 'x', side): None,
+                   tb.canonical_code(0, 0, 'o', side): None}
+    layers = [empty_board]
+    start = time.perf_counter()
+    while len(layers) <= cells:
+        unfinished = [code for code, score in layers[-1].items() if score is None]
+        layer = {}
+        for part in _run(_expand, unfinished, side, win_len, None, workers):
+            layer.update(part)
+        layers.append(layer)
+        if verbose:
+            print(f"Layer {len(layers) - 1:>2}: {len(layer):>9} positions "
+                  f"({time.perf_counter() - start:.1f}s)")
+
+    for idx in range(cells - 1, -1, -1):
+        layer = layers[idx]
+        unfinished = [code for code, score in layer.items() if score is None]
+        for part in _run(_back_up, unfinished, side, win_len, layers[idx + 1], workers):
+            layer.update(part)
+        if verbose:
+            print(f"Scored layer {idx:>2} ({time.perf_counter() - start:.1f}s)")
+
+    scores = {}
+    for layer in layers:
+        scores.update(layer)
+    return scores
+
+
+def main() -> None:
+    """
+    solve a board and write its tablebase from the command line
+    """
+    parser = argparse.ArgumentParser(description="Build an exact sorted tablebase.")
+    parser.add_argument("--side", type=int, default=4,
+                        help="board side length (default 4)")
+    parser.add_argument("--win-len", type=int, default=None,
+                        help="winning step length (default the side length)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="worker processes (default one per CPU)")
+    parser.add_argument("--output", default=None,
+                        help="tablebase file to write (default "
+                             "assets/tablebase/ttt<side>w<win-len>.bin)")
+    args = parser.parse_args()
+    if not 3 <= args.side <= tb.MAX_SORTED_SIDE:
+        parser.error(f"the side length must be between 3 and {tb.MAX_SORTED_SIDE}")
+    win_len = args.win_len or args.side
+    path = args.output or tb.sorted_path(args.side, win_len)
+
+    start = time.perf_counter()
+    scores = solve(args.side, win_len, args.workers, verbose=True)
+    tb.write_sorted(path, args.side, win_len, scores)
+    print(f"Solved {len(scores)} positions into {os.path.normpath(path)} "
+          f"({os.path.getsize(path) / 2 ** 20:.1f} MiB) in "
+          f"{time.perf_counter() - start:.1f}s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,408 @@
+"""
+Precomputed perfect-play tablebases for 3x3 and 4x4 Tic Tac Toe.
+
+A tablebase file holds the exact Minimax score of every position reachable in a game,
+for either piece to move next, in units of `tictactoe.WIN_SCORE`: one more than the
+number of empty cells left when 'x' wins under perfect play, its negative when 'o' wins,
+or 0 for a tie. The score thus tells both who wins and how many moves the game lasts.
+Tablebases are generated once, and looked up at runtime through read-only memory maps.
+
+The 3x3 tablebase is generated by running this module, and is dense, so a lookup is a
+single byte read. File layout:
+    - `MAGIC` (4 bytes)
+    - the scores with 'x' to move next, one signed byte per position
+    - the scores with 'o' to move next, one signed byte per position
+where a position's byte is found at its base-3 code: the sum of `digit * 3 ** cell` over
+all cells, with digit 0 for an empty cell, 1 for 'x' and 2 for 'o'. Positions that
+cannot be reached in a game hold `UNREACHABLE`.
+
+Larger boards have far too many base-3 codes for a dense file, so their tablebases are
+sorted: they are generated by `retrograde.py`, hold only the reachable positions up to
+rotations and reflections, and are looked up by a binary search. File layout:
+    - `SORTED_MAGIC` (4 bytes), the side length and the winning step length (1 byte
+      each), 2 bytes of padding, and the number of positions (8 bytes)
+    - the `canonical_code` of every position, in increasing order (8 bytes each)
+    - the score of every position, in the same order (1 signed byte each)
+where all integers are little-endian.
+"""
+from __future__ import annotations
+from typing import Any, Optional
+import bisect
+import mmap
+import os
+import struct
+import sys
+
+# side length and winning step length of the games covered by the tablebase
+SIDE = 3
+WIN_LEN = 3
+
+# number of positions in one plane of the tablebase, 3 ** 9
+NUM_CODES = 3 ** (SIDE * SIDE)
+
+# first bytes of a tablebase file
+MAGIC = b"TTT3"
+
+# score byte of the positions that cannot be reached
+UNREACHABLE = -128
+
+# default location of the tablebase file
+DEFAULT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir,
+                            "assets", "tablebase", "ttt3.bin")
+
+# first bytes of a sorted tablebase file, and the layout of its header
+SORTED_MAGIC = b"TTTS"
+SORTED_HEADER = struct.Struct("<4sBB2xQ")
+
+# largest board side length a sorted tablebase can hold, so that position codes fit in
+# 64 bits
+MAX_SORTED_SIDE = 5
+
+# the tablebases loaded by `load`, cached by path
+_LOADED = {}
+
+# cache of the lookup tables of `canonical_code` for every board side length
+_CODE_TABLES = {}
+
+
+def position_code(x_bits: int, o_bits: int) -> int:
+    """
+    return the base-3 code of the position with the given 'x' and 'o' bitboards
+
+    >>> position_code(0b1, 0b10)  # 'x' on cell 0, 'o' on cell 1
+    7
+    """
+    code = 0
+    place = 1
+    for cell in range(SIDE * SIDE):
+        if x_bits >> cell & 1:
+            code += place
+        elif o_bits >> cell & 1:
+            code += 2 * place
+        place *= 3
+    return code
+
+
+def sorted_path(side: int, win_len: int) -> str:
+    """
+    return the default location of the sorted tablebase of the given board side length
+    and winning step length
+    """
+    return os.path.join(os.path.dirname(DEFAULT_PATH), f"ttt{side}w{win_len}.bin")
+
+
+def code_tables(side: int) -> list:
+    """
+    return, for each of the 8 board symmetries, the tables that move the cells of every
+    byte of a board code (see `canonical_code`) by the symmetry: `tables[t][i][b]` is the
+    image of the board code holding byte `b` at byte `i`, and nothing else
+
+    >>> tables = code_tables(2)
+    >>> bin(tables[1][0][0b1])  # 'x' on cell 0, rotated clockwise to cell 1
+    '0b10'
+    """
+    if side not in _CODE_TABLES:
+        import tictactoe as ttt
+        cells = side * side
+        num_bytes = (2 * cells + 7) // 8
+        tables = []
+        for cell_map in ttt.symmetries(side):
+            # the image of every bit of a board code: 'x' bits first, then 'o' bits
+            images = [1 << cell_map[bit] for bit in range(cells)] + \
+                     [1 << (cells + cell_map[bit]) for bit in range(cells)]
+            byte_tables = []
+            for idx in range(num_bytes):
+                table = []
+                for byte in range(256):
+                    image = 0
+                    for bit in range(8):
+                        if byte >> bit & 1 and 8 * idx + bit < 2 * cells:
+                            image |= images[8 * idx + bit]
+                    table.append(image)
+                byte_tables.append(table)
+            tables.append(byte_tables)
+        _CODE_TABLES[side] = tables
+    return _CODE_TABLES[side]
+
+
+def canonical_code(x_bits: int, o_bits: int, piece: str, side: int) -> int:
+    """
+    return the code of the given position with `piece` to move next that is the same for
+    all 8 rotations and reflections of the position: the smallest board code
+    `x_bits | o_bits << (side * side)` among the symmetries, shifted left by one bit
+    that is set when 'o' is to move
+
+    >>> canonical_code(0b100, 0, 'o', 3) == canonical_code(0b1, 0, 'o', 3)  # corners
+    True
+    >>> canonical_code(0b1, 0, 'o', 3), canonical_code(0b1, 0, 'x', 3)
+    (3, 2)
+    """
+    board = x_bits | o_bits << (side * side)
+    best = board
+    for byte_tables in code_tables(side)[1:]:
+        image = 0
+        rest = board
+        for table in byte_tables:
+            image |= table[rest & 0xff]
+            rest >>= 8
+        if image < best:
+            best = image
+    return best << 1 | (piece == 'o')
+
+
+def _solve_all() -> dict:
+    """
+    solve every position reachable from the empty board with either piece moving first,
+    and return a mapping from (x bitboard, o bitboard, piece to move) to exact score
+    """
+    import tictactoe as ttt
+    masks = ttt.win_masks(SIDE, WIN_LEN)
+    full = (1 << (SIDE * SIDE)) - 1
+    scores = {}
+
+    def solve(x_bits: int, o_bits: int, piece: str) -> int:
+        if (x_bits, o_bits, piece) in scores:
+            return scores[(x_bits, o_bits, piece)]
+
+        empty = full & ~(x_bits | o_bits)
+        num_empty = ttt.popcount(empty)
+        if any(x_bits & mask == mask for mask in masks):
+            score = num_empty + 1
+        elif any(o_bits & mask == mask for mask in masks):
+            score = -num_empty - 1
+        elif not empty:
+            score = 0
+        elif piece == 'x':
+            score = max(solve(x_bits | 1 << cell, o_bits, 'o')
+                        for cell in ttt.iter_cells(empty))
+        else:
+            score = min(solve(x_bits, o_bits | 1 << cell, 'x')
+                        for cell in ttt.iter_cells(empty))
+
+        scores[(x_bits, o_bits, piece)] = score
+        return score
+
+    solve(0, 0, 'x')
+    solve(0, 0, 'o')
+    return scores
+
+
+def generate(path: str = DEFAULT_PATH) -> int:
+    """
+    solve all reachable 3x3 positions and write the tablebase file to `path`; return the
+    number of positions solved
+    """
+    scores = _solve_all()
+    planes = {'x': bytearray([UNREACHABLE & 0xff]) * NUM_CODES,
+              'o': bytearray([UNREACHABLE & 0xff]) * NUM_CODES}
+    for (x_bits, o_bits, piece), score in scores.items():
+        planes[piece][position_code(x_bits, o_bits)] = score & 0xff
+
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "wb") as file:
+        file.write(MAGIC + planes['x'] + planes['o'])
+    return len(scores)
+
+
+class Tablebase:
+    """
+    A memory-mapped 3x3 tablebase file.
+
+    >>> import tictactoe as ttt
+    >>> base = load()
+    >>> game = ttt.GameState(ttt.empty_board(3))
+    >>> base.score(game, 'x')  # perfect play from the empty board is a tie
+    0
+    >>> game.place_piece('x', 0)
+    >>> game.place_piece('o', 1)
+    >>> [cell for cell, score in base.solve(game, 'x').items() if score > 0]
+    [3, 4, 6]
+    """
+    # Private Instance Attributes:
+    #   - _file: the open tablebase file
+    #   - _map: read-only memory map of the tablebase file
+    _file: Any
+    _map: mmap.mmap
+
+    def __init__(self, path: str = DEFAULT_PATH) -> None:
+        self._file = open(path, "rb")
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._map[:len(MAGIC)] != MAGIC or \
+                len(self._map) != len(MAGIC) + 2 * NUM_CODES:
+            self.close()
+            raise ValueError(f"[!] {path} is not a 3x3 tablebase file.")
+
+    def close(self) -> None:
+        """
+        unmap and close the tablebase file
+        """
+        self._map.close()
+        self._file.close()
+
+    def covers(self, game: Any) -> bool:
+        """
+        return whether the given game can be looked up in this tablebase
+        """
+        return game.get_side_length() == SIDE and game.get_win_length() == WIN_LEN
+
+    def _lookup(self, x_bits: int, o_bits: int, piece: str) -> Optional[int]:
+        """
+        return the exact score of the given position, or `None` if it is unreachable
+        """
+        offset = len(MAGIC) + position_code(x_bits, o_bits)
+        if piece == 'o':
+            offset += NUM_CODES
+        score = self._map[offset]
+        score = score - 256 if score >= 128 else score
+        return None if score == UNREACHABLE else score
+
+    def score(self, game: Any, piece: str) -> Optional[int]:
+        """
+        return the exact Minimax score of the given game with `piece` to move next, or
+        `None` if the position cannot be reached in a game
+
+        Preconditions:
+            - self.covers(game)
+        """
+        return self._lookup(*game.get_bitboards(), piece)
+
+    def solve(self, game: Any, piece: str) -> dict:
+        """
+        return a mapping from every vacant cell of the given game to the exact Minimax
+        score reached by `piece` playing there, in the order of `game.empty_cells`
+
+        Preconditions:
+            - self.covers(game)
+            - the game has no winner yet
+        """
+        x_bits, o_bits = game.get_bitboards()
+        other = 'o' if piece == 'x' else 'x'
+        scores = {}
+        for cell in game.empty_cells:
+            if piece == 'x':
+                scores[cell] = self._lookup(x_bits | 1 << cell, o_bits, other)
+            else:
+                scores[cell] = self._lookup(x_bits, o_bits | 1 << cell, other)
+        return scores
+
+
+class SortedTablebase(Tablebase):
+    """
+    A memory-mapped sorted tablebase file, generated by `retrograde.py`.
+
+    Instance Attributes:
+        - side: the board side length of the games covered by the tablebase
+        - win_len: the winning step length of the games covered by the tablebase
+        - count: the number of positions in the tablebase
+    """
+    side: int
+    win_len: int
+    count: int
+
+    # Private Instance Attributes:
+    #   - _codes: the canonical codes of the positions, in increasing order
+    #   - _scores: the scores of the positions, in the order of `_codes`
+    _codes: memoryview
+    _scores: memoryview
+
+    def __init__(self, path: str) -> None:
+        if sys.byteorder != "little":
+            raise ValueError("[!] Sorted tablebases can only be read on little-endian "
+                             "machines.")
+        self._file = open(path, "rb")
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.side, self.win_len, self.count = \
+            SORTED_HEADER.unpack_from(self._map)
+        start = SORTED_HEADER.size
+        if magic != SORTED_MAGIC or len(self._map) != start + 9 * self.count:
+            self.close()
+            raise ValueError(f"[!] {path} is not a sorted tablebase file.")
+        view = memoryview(self._map)
+        self._codes = view[start:start + 8 * self.count].cast('Q')
+        self._scores = view[start + 8 * self.count:].cast('b')
+
+    def close(self) -> None:
+        """
+        release the views of the tablebase file, then unmap and close it
+        """
+        if hasattr(self, "_codes"):
+            self._codes.release()
+            self._scores.release()
+        super().close()
+
+    def covers(self, game: Any) -> bool:
+        """
+        return whether the given game can be looked up in this tablebase
+        """
+        return game.get_side_length() == self.side \
+            and game.get_win_length() == self.win_len
+
+    def _lookup(self, x_bits: int, o_bits: int, piece: str) -> Optional[int]:
+        """
+        return the exact score of the given position, or `None` if it is unreachable
+        """
+        code = canonical_code(x_bits, o_bits, piece, self.side)
+        idx = bisect.bisect_left(self._codes, code)
+        if idx < self.count and self._codes[idx] == code:
+            return self._scores[idx]
+        return None
+
+
+def write_sorted(path: str, side: int, win_len: int, scores: dict) -> None:
+    """
+    write a sorted tablebase file to `path`, from a mapping of the canonical codes of
+    positions to their scores
+    """
+    codes = sorted(scores)
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "wb") as file:
+        file.write(SORTED_HEADER.pack(SORTED_MAGIC, side, win_len, len(codes)))
+        file.write(b''.join(code.to_bytes(8, "little") for code in codes))
+        file.write(bytes(scores[code] & 0xff for code in codes))
+
+
+def load(path: str = DEFAULT_PATH) -> Optional[Tablebase]:
+    """
+    return the tablebase at `path`, dense or sorted, opened once and cached, or `None`
+    if it has not been generated
+    """
+    if path not in _LOADED:
+        if not os.path.exists(path):
+            _LOADED[path] = None
+        else:
+            with open(path, "rb") as file:
+                magic = file.read(len(SORTED_MAGIC))
+            _LOADED[path] = SortedTablebase(path) if magic == SORTED_MAGIC \
+                else Tablebase(path)
+    return _LOADED[path]
+
+
+def find(game: Any) -> Optional[Tablebase]:
+    """
+    return the tablebase at its default location that covers the given game, or `None`
+    if there is none or it has not been generated
+    """
+    side, win_len = game.get_side_length(), game.get_win_length()
+    if side == SIDE and win_len == WIN_LEN:
+        return load()
+    if side <= MAX_SORTED_SIDE:
+        return load(sorted_path(side, win_len))
+    return None
+
+
+def solve(game: Any, piece: str) -> dict:
+    """
+    return the exact Minimax score of every vacant cell in the given 3x3 game when played
+    by `piece`, using the default tablebase; see `Tablebase.solve`
+    """
+    base = load()
+    if base is None:
+        raise FileNotFoundError(f"[!] Tablebase {DEFAULT_PATH} has not been generated.")
+    return base.solve(game, piece)
+
+
+if __name__ == '__main__':
+    print(f"Solved {generate()} positions into {os.path.normpath(DEFAULT_PATH)}")
+
+    import doctest
+    doctest.testmod()
@@ -1,14 +1,25 @@
 from __future__ import annotations
-from typing import Optional, Any, Union
+from typing import Optional, Any, Union, Callable
 import random
-import copy
+import sys
+import time
 import game_tree as gt
+import transposition as tp
+
+if sys.implementation.name == "brython":  # memory maps are not available in the browser
+    tb = None
+else:
+    import tablebase as tb
 
 
 ################################################################################
 # Tic Tac Toe game representation
 ################################################################################
 
+# largest supported board side length, for gomoku-style play on a 15x15 board
+MAX_SIDE = 15
+
+
 def empty_board(side: int) -> list:
     """
     generate an empty game board (list of lists) with sidelength `side`
@@ -23,42 +34,447 @@ def empty_board(side: int) -> list:
     return board
 
 
+# cache of the winning line bitmasks for every (board side length, winning step length)
+# pair seen so far; a cell at (row, col) is represented by bit `row * side + col` of a
+# bitboard
+_WIN_MASKS = {}
+
+# cache of the indices of the winning lines (into `win_masks`) through each cell, for
+# every (board side length, winning step length) pair
+_CELL_LINES = {}
+
+# cache of the Zobrist keys for every board side length: a random key per cell for each
+# game piece, and a key that is mixed in when 'o' is the piece to move next
+_ZOBRIST = {}
+
+# cache of the 8 symmetries (rotations and reflections) of every board side length, and
+# of the Zobrist keys of each cell under every symmetry
+_SYMMETRIES = {}
+_SYMMETRIC_ZOBRIST = {}
+
+# cache of the static move order of every (board side length, winning step length) pair
+_MOVE_ORDERS = {}
+
+
+def win_masks(side: int, win_len: Optional[int] = None) -> list:
+    """
+    return the bitmasks of every winning line of a board with sidelength `side`, where a
+    winning line is `win_len` adjacent cells in a row, column or diagonal (the whole side
+    length if `win_len` is not given); the masks are listed as all horizontal lines, then
+    vertical lines, then diagonals, then anti-diagonals, and are computed once and cached
+
+    >>> [bin(mask) for mask in win_masks(2)]
+    ['0b11', '0b1100', '0b101', '0b1010', '0b1001', '0b110']
+    >>> len(win_masks(4, 3))  # 8 horizontal, 8 vertical and 4 of each diagonal
+    24
+    """
+    win_len = side if win_len is None else win_len
+    if (side, win_len) not in _WIN_MASKS:
+        starts = range(side - win_len + 1)
+        steps = range(win_len)
+        masks = []
+        for row in range(side):
+            for col in starts:
+                masks.append(sum(1 << (row * side + col + i) for i in steps))
+        for col in range(side):
+            for row in starts:
+                masks.append(sum(1 << ((row + i) * side + col) for i in steps))
+        for row in starts:
+            for col in starts:
+                masks.append(sum(1 << ((row + i) * side + col + i) for i in steps))
+        for row in starts:
+            for col in starts:
+                masks.append(sum(1 << ((row + i) * side + col + win_len - 1 - i)
+                                 for i in steps))
+        _WIN_MASKS[(side, win_len)] = masks
+    return _WIN_MASKS[(side, win_len)]
+
+
+def cell_lines(side: int, win_len: Optional[int] = None) -> list:
+    """
+    return, for every cell of a board with sidelength `side`, a tuple of the indices (in
+    `win_masks`) of the winning lines of length `win_len` that pass through the cell
+
+    >>> cell_lines(3)[4]  # the center is on the middle row, middle column and diagonals
+    (1, 4, 6, 7)
+    >>> len(cell_lines(5, 4)[0]), len(cell_lines(5, 4)[12])
+    (3, 8)
+    """
+    win_len = side if win_len is None else win_len
+    if (side, win_len) not in _CELL_LINES:
+        masks = win_masks(side, win_len)
+        _CELL_LINES[(side, win_len)] = [
+            tuple(idx for idx, mask in enumerate(masks) if mask & (1 << cell))
+            for cell in range(side * side)
+        ]
+    return _CELL_LINES[(side, win_len)]
+
+
+def move_order(side: int, win_len: Optional[int] = None) -> list:
+    """
+    return the cells of a board with sidelength `side` in the order the search tries
+    their moves before it knows anything else about them: cells on more winning lines of
+    length `win_len` first, which puts the center and the corners ahead of the edges, and
+    cells nearer the center first among cells on as many lines
+
+    >>> move_order(3)
+    [4, 0, 2, 6, 8, 1, 3, 5, 7]
+    """
+    win_len = side if win_len is None else win_len
+    if (side, win_len) not in _MOVE_ORDERS:
+        lines = cell_lines(side, win_len)
+        last = side - 1
+
+        def rank(cell: int) -> tuple[int, int]:
+            row, col = divmod(cell, side)
+            return -len(lines[cell]), (2 * row - last) ** 2 + (2 * col - last) ** 2
+
+        _MOVE_ORDERS[(side, win_len)] = sorted(range(side * side), key=rank)
+    return _MOVE_ORDERS[(side, win_len)]
+
+
+def open_line_weights(win_len: int) -> list:
+    """
+    return the weight of an open winning line (one that holds pieces of only one player)
+    by the number of pieces on it, used by `GameState.open_lines_score`; every extra piece
+    on a line quadruples its weight
+
+    >>> open_line_weights(4)
+    [0, 1, 4, 16, 64]
+    """
+    return [0] + [4 ** (count - 1) for count in range(1, win_len + 1)]
+
+
+def zobrist_keys(side: int) -> tuple[list, list, int]:
+    """
+    return the Zobrist keys of a board with sidelength `side`, as a tuple of the 'x' keys
+    and the 'o' keys (both indexed by cell number), and the key for 'o' to move next
+
+    the keys are drawn from a generator seeded with the side length, so they are the same
+    in every run
+
+    >>> x_keys, o_keys, o_turn_key = zobrist_keys(3)
+    >>> len(x_keys), len(o_keys), x_keys == zobrist_keys(3)[0]
+    (9, 9, True)
+    """
+    if side not in _ZOBRIST:
+        rng = random.Random(side)
+        x_keys = [rng.getrandbits(64) for _ in range(side * side)]
+        o_keys = [rng.getrandbits(64) for _ in range(side * side)]
+        _ZOBRIST[side] = (x_keys, o_keys, rng.getrandbits(64))
+    return _ZOBRIST[side]
+
+
+def symmetries(side: int) -> list:
+    """
+    return the 8 symmetries of a square board with sidelength `side` (the D4 group), each
+    as a list mapping every cell number to the cell number it is moved to
+
+    the symmetries are, in order: the identity, rotations by 90, 180 and 270 degrees
+    clockwise, the left-right and top-bottom reflections, and the reflections across the
+    main diagonal and the anti-diagonal
+
+    >>> symmetries(2)[1]  # rotate clockwise by 90 degrees
+    [1, 3, 0, 2]
+    """
+    if side not in _SYMMETRIES:
+        last = side - 1
+        images = [
+            lambda r, c: (r, c),
+            lambda r, c: (c, last - r),
+            lambda r, c: (last - r, last - c),
+            lambda r, c: (last - c, r),
+            lambda r, c: (r, last - c),
+            lambda r, c: (last - r, c),
+            lambda r, c: (c, r),
+            lambda r, c: (last - c, last - r)
+        ]
+        maps = []
+        for image in images:
+            cell_map = []
+            for cell in range(side * side):
+                row, col = image(cell // side, cell % side)
+                cell_map.append(row * side + col)
+            maps.append(cell_map)
+        _SYMMETRIES[side] = maps
+    return _SYMMETRIES[side]
+
+
+def symmetric_zobrist_keys(side: int) -> tuple[list, list]:
+    """
+    return the Zobrist keys of every cell under each of the 8 board symmetries, as a tuple
+    of the 'x' keys and the 'o' keys; `keys[cell][t]` is the key of the cell that `cell`
+    is moved to by symmetry `t`
+
+    >>> x_sym_keys, _ = symmetric_zobrist_keys(3)
+    >>> x_sym_keys[0][2] == zobrist_keys(3)[0][8]  # rotating 180 degrees moves 0 to 8
+    True
+    """
+    if side not in _SYMMETRIC_ZOBRIST:
+        x_keys, o_keys, _ = zobrist_keys(side)
+        maps = symmetries(side)
+        _SYMMETRIC_ZOBRIST[side] = (
+            [tuple(x_keys[cell_map[cell]] for cell_map in maps)
+             for cell in range(side * side)],
+            [tuple(o_keys[cell_map[cell]] for cell_map in maps)
+             for cell in range(side * side)]
+        )
+    return _SYMMETRIC_ZOBRIST[side]
+
+
+def transform_bits(bits: int, cell_map: list) -> int:
+    """
+    return the given bitboard with every cell moved according to `cell_map`, one of the
+    maps returned by `symmetries`
+
+    >>> bin(transform_bits(0b0001, symmetries(2)[1]))
+    '0b10'
+    """
+    result = 0
+    for cell in iter_cells(bits):
+        result |= 1 << cell_map[cell]
+    return result
+
+
+def iter_cells(bits: int) -> Any:
+    """
+    yield the cell numbers of all set bits in the given bitboard, lowest cell first
+
+    >>> list(iter_cells(0b10110))
+    [1, 2, 4]
+    """
+    while bits:
+        lowest = bits & -bits
+        yield lowest.bit_length() - 1
+        bits ^= lowest
+
+
+def popcount(bits: int) -> int:
+    """
+    return the number of set bits in the given bitboard
+
+    >>> popcount(0b10110)
+    3
+    """
+    return bin(bits).count('1')
+
+
 class GameState():
     """
     Instance Attributes:
         - next_player: the player from {'p1', 'p2'} that will place the next game piece
-        - empty_spots: a list of vacant spot on the game board available to be filled
+        - empty_cells: a list of the vacant cells on the game board available to be
+          filled
+        - empty_spots: the same list as `empty_cells`, under the name it had when the
+          cells were "rc" strings
         - move_history: a history of moves that occured in this game
+
+    A move is the number of the cell it fills: the cell at (row, col) is number
+    `row * side + col`. The board is stored as two integer bitboards, one for each game
+    piece, where a cell is represented by the bit of its number. A piece wins by filling
+    a winning line of `win_len` adjacent cells in a row, column or diagonal.
+
+    >>> game = GameState(empty_board(3))
+    >>> game.place_piece('x', 4)
+    >>> game.empty_cells
+    [0, 1, 2, 3, 5, 6, 7, 8]
+    >>> game.get_board()[1]
+    ['', 'x', '']
+    >>> game = GameState(empty_board(5), win_len=3)
+    >>> for cell in [6, 0, 12, 1]:
+    ...     game.place_piece('x' if game.next_player == 'p1' else 'o', cell)
+    >>> game.get_winning_piece() is None
+    True
+    >>> game.place_piece('x', 18)
+    >>> game.get_winning_piece()
+    'x'
     """
     next_player: str
-    empty_spots: list[Optional[str]]
-    move_history: list[Optional[str]]
+    move_history: list[int]
 
     # Private Instance Attributes:
-    #   - _board: a nested list representing a tictactoe board
     #   - _board_side: the side length of the board
-    _board: list[list[str]]
+    #   - _win_len: the number of adjacent pieces in a winning line
+    #   - _cell_lines: the winning lines through each cell, from `cell_lines`
+    #   - _x_bits: bitboard of the cells occupied by 'x'
+    #   - _o_bits: bitboard of the cells occupied by 'o'
+    #   - _full_mask: bitboard with every cell of the board set
+    #   - _sym_hashes: Zobrist hashes of the pieces on the board under each of the 8
+    #     board symmetries (index 0 is the board as is), updated on every move
+    #   - _x_counts: the number of 'x' pieces on each winning line in `win_masks`
+    #   - _o_counts: the number of 'o' pieces on each winning line in `win_masks`
+    #   - _x_lines: the number of winning lines completely filled by 'x'
+    #   - _o_lines: the number of winning lines completely filled by 'o'
+    #   - _weights: the weight of an open line by its number of pieces, from
+    #     `open_line_weights`
+    #   - _open_score: the sum of the weights of the lines open to 'x' minus those open to
+    #     'o', updated on every move
     _board_side: int
+    _win_len: int
+    _cell_lines: list[tuple]
+    _x_bits: int
+    _o_bits: int
+    _full_mask: int
+    _sym_hashes: list[int]
+    _x_counts: list[int]
+    _o_counts: list[int]
+    _x_lines: int
+    _o_lines: int
+    _weights: list[int]
+    _open_score: int
 
     def __init__(
             self,
             board: list[list[str]],
             next_player: str = 'p1',
-            move_hist: Optional[list] = None
+            move_hist: Optional[list] = None,
+            win_len: Optional[int] = None
     ) -> None:
-        self._board = board
-        self._board_side = len(self._board)  # calculate the side length of the game board
+        """
+        initialize a game state from the given board; `win_len` is the number of adjacent
+        pieces needed to win, which defaults to the side length of the board
+
+        Preconditions:
+            - 1 <= len(board) <= MAX_SIDE, or a `ValueError` will be raised
+            - 1 <= win_len <= len(board), or a `ValueError` will be raised
+        """
+        self._board_side = len(board)  # calculate the side length of the game board
+        if not 1 <= self._board_side <= MAX_SIDE:
+            raise ValueError(f"[!] Board side length {self._board_side} is not between 1 "
+                             f"and {MAX_SIDE}.")
+        self._win_len = self._board_side if win_len is None else win_len
+        if not 1 <= self._win_len <= self._board_side:
+            raise ValueError(f"[!] Winning step length {self._win_len} does not fit on "
+                             f"a board of side length {self._board_side}.")
+        self._cell_lines = cell_lines(self._board_side, self._win_len)
+        self._full_mask = (1 << (self._board_side ** 2)) - 1
+        self._x_bits = 0
+        self._o_bits = 0
+        self._sym_hashes = [0] * 8
+        x_sym_keys, o_sym_keys = symmetric_zobrist_keys(self._board_side)
+        for row_idx, row in enumerate(board):
+            for col_idx, piece in enumerate(row):
+                cell = row_idx * self._board_side + col_idx
+                if piece == 'x':
+                    self._x_bits |= 1 << cell
+                    self._xor_hashes(x_sym_keys[cell])
+                elif piece == 'o':
+                    self._o_bits |= 1 << cell
+                    self._xor_hashes(o_sym_keys[cell])
+        # count the pieces on every winning line, and the lines that are already won
+        masks = win_masks(self._board_side, self._win_len)
+        self._x_counts = [popcount(self._x_bits & mask) for mask in masks]
+        self._o_counts = [popcount(self._o_bits & mask) for mask in masks]
+        self._x_lines = self._x_counts.count(self._win_len)
+        self._o_lines = self._o_counts.count(self._win_len)
+        self._weights = open_line_weights(self._win_len)
+        self._open_score = sum(
+            self._weights[x_count] if not o_count else -self._weights[o_count]
+            for x_count, o_count in zip(self._x_counts, self._o_counts)
+            if not (x_count and o_count)
+        )
         self.move_history = move_hist if move_hist is not None else []
         self.next_player = next_player
-        self.empty_spots = self._find_empty_spots()
 
-    def _find_empty_spots(self) -> list[Optional[str]]:
-        empty_spots = []
-        for row_idx in range(self._board_side):
-            for col_idx in range(self._board_side):
-                if self._board[row_idx][col_idx] == '':
-                    empty_spots.append(str(row_idx) + str(col_idx))
-        return empty_spots
+    @property
+    def empty_cells(self) -> list[int]:
+        """
+        return a list of the vacant cells on the game board, in row-major order
+        """
+        return list(iter_cells(self.empty_bits()))
+
+    @property
+    def empty_spots(self) -> list[int]:
+        """
+        return a list of the vacant cells on the game board, in row-major order; an alias
+        of `empty_cells` kept for the callers of its former name
+
+        >>> GameState(empty_board(3)).empty_spots[:3]
+        [0, 1, 2]
+        """
+        return self.empty_cells
+
+    def empty_bits(self) -> int:
+        """
+        return the bitboard of the vacant cells on the game board
+        """
+        return self._full_mask & ~(self._x_bits | self._o_bits)
+
+    def count_empty(self) -> int:
+        """
+        return the number of vacant cells on the game board
+        """
+        return popcount(self.empty_bits())
+
+    def position_key(self, piece: str) -> int:
+        """
+        return the Zobrist hash of the current position with `piece` to move next
+
+        >>> game = GameState(empty_board(3))
+        >>> game.push_move('x', 0)
+        >>> key = game.position_key('o')
+        >>> game.pop_move()
+        0
+        >>> game.push_move('x', 0)
+        >>> game.position_key('o') == key, game.position_key('x') == key
+        (True, False)
+        """
+        if piece == 'o':
+            return self._sym_hashes[0] ^ zobrist_keys(self._board_side)[2]
+        return self._sym_hashes[0]
+
+    def canonical_key(self, piece: str) -> int:
+        """
+        return a hash of the current position with `piece` to move next that is the same
+        for all 8 rotations and reflections of the position
+
+        >>> game = GameState(empty_board(3))
+        >>> game.push_move('x', 0)
+        >>> keys = game.canonical_key('o'), game.position_key('o')
+        >>> game.pop_move()
+        0
+        >>> game.push_move('x', 8)
+        >>> game.canonical_key('o') == keys[0], game.position_key('o') == keys[1]
+        (True, False)
+        """
+        if piece == 'o':
+            return min(self._sym_hashes) ^ zobrist_keys(self._board_side)[2]
+        return min(self._sym_hashes)
+
+    def canonical_form(self) -> tuple[tuple[int, int], int]:
+        """
+        return the minimal representative of the current position among its 8 rotations
+        and reflections, as a tuple of the ('x', 'o') bitboards, along with the index of
+        the symmetry in `symmetries` that maps the current board onto it
+
+        >>> game = GameState([['', '', 'x'], ['', '', ''], ['', '', '']])
+        >>> game.canonical_form()
+        ((1, 0), 3)
+        """
+        best = None
+        best_idx = 0
+        for idx, cell_map in enumerate(symmetries(self._board_side)):
+            form = (transform_bits(self._x_bits, cell_map),
+                    transform_bits(self._o_bits, cell_map))
+            if best is None or form < best:
+                best = form
+                best_idx = idx
+        return best, best_idx
+
+    def open_lines_score(self) -> int:
+        """
+        return the sum of the weights (see `open_line_weights`) of the winning lines that
+        hold only 'x' pieces, minus those that hold only 'o' pieces
+
+        >>> game = GameState(empty_board(3))
+        >>> game.push_move('x', 4)
+        >>> game.open_lines_score()  # 4 lines through the center with one 'x' each
+        4
+        >>> game.push_move('o', 0)  # blocks a diagonal, and opens 2 lines for 'o'
+        >>> game.open_lines_score()
+        1
+        """
+        return self._open_score
 
     def get_side_length(self) -> int:
         """
@@ -66,83 +482,227 @@ class GameState():
         """
         return self._board_side
 
-    def place_piece(self, piece: str, spot: str) -> None:
+    def get_win_length(self) -> int:
         """
-        place the given piece on the given spot on the game board, if the spot is empty;
-        ensure that the spot given exists on the board (is not out of range)
+        return the number of adjacent pieces needed to win
+        """
+        return self._win_len
+
+    def get_board(self) -> list[list[str]]:
+        """
+        return the game board as a nested list of '', 'x' and 'o'
+        """
+        board = empty_board(self._board_side)
+        for cell in iter_cells(self._x_bits):
+            board[cell // self._board_side][cell % self._board_side] = 'x'
+        for cell in iter_cells(self._o_bits):
+            board[cell // self._board_side][cell % self._board_side] = 'o'
+        return board
+
+    def get_bitboards(self) -> tuple[int, int]:
+        """
+        return the bitboards of the cells occupied by 'x' and by 'o'
+        """
+        return self._x_bits, self._o_bits
+
+    def place_piece(self, piece: str, cell: int) -> None:
+        """
+        place the given piece on the given cell of the game board, if the cell is empty;
+        ensure that the cell given exists on the board (is not out of range)
 
         Preconditions:
-            - `spot` must be a string of two integers, first representing the row, second
-              representing the column in the board. `ValueError`s will be raised if this
-              is not satisfied
-            - the spot must be empty, or a `ValueError` will be raised
+            - `cell` must be an integer in range(side * side), or a `ValueError` will be
+              raised
+            - the cell must be empty, or a `ValueError` will be raised
             - piece in {'x', 'o'}
+
+        >>> game = GameState(empty_board(3))
+        >>> game.place_piece('x', 9)
+        Traceback (most recent call last):
+        ...
+        ValueError: [!] Given cell 9 is out of range.
+        """
+        if not isinstance(cell, int) or not 0 <= cell < self._board_side ** 2:
+            raise ValueError(f"[!] Given cell {cell!r} is out of range.")
+
+        if (1 << cell) & self.empty_bits():  # cell is empty
+            self.push_move(piece, cell)
+        else:
+            raise ValueError(f"[!] Given cell {cell} is not empty.")
+
+    def push_move(self, piece: str, cell: int) -> None:
         """
-        row = int(spot[0])
-        col = int(spot[1])
+        place the given piece on the given cell in place, without any validation; this is
+        the fast path used by game tree searches, and can be undone by `pop_move`
 
-        if row > self._board_side or row < 0:
-            raise ValueError(f"[!] Given row {row} in spot {spot} is out of range.")
-        if col > self._board_side or col < 0:
-            raise ValueError(f"[!] Given column {col} in spot {spot} is out of range.")
+        Preconditions:
+            - `cell` is an empty cell of the game board
+            - piece in {'x', 'o'}
 
-        if spot in self.empty_spots:  # check if the spot is empty
-            self._board[row][col] = piece
-            self.empty_spots.remove(spot)
-            self.next_player = 'p2' if self.next_player == 'p1' else 'p1'
-            self.move_history.append(spot)
+        >>> game = GameState(empty_board(3))
+        >>> game.push_move('x', 2)
+        >>> game.move_history, game.next_player
+        ([2], 'p2')
+        >>> game.pop_move()
+        2
+        >>> game.move_history, game.next_player, game.count_empty()
+        ([], 'p1', 9)
+        """
+        side = self._board_side
+        win_len = self._win_len
+        weights = self._weights
+        delta = 0
+        if piece == 'x':
+            self._x_bits |= 1 << cell
+            self._xor_hashes(symmetric_zobrist_keys(side)[0][cell])
+            counts, others = self._x_counts, self._o_counts
+            for line in self._cell_lines[cell]:
+                count = counts[line]
+                counts[line] = count + 1
+                if count + 1 == win_len:
+                    self._x_lines += 1
+                # the line either stays open for 'x', or gets blocked for 'o'
+                if not others[line]:
+                    delta += weights[count + 1] - weights[count]
+                elif not count:
+                    delta += weights[others[line]]
         else:
-            raise ValueError(f"[!] Given spot {spot} is not empty.")
+            self._o_bits |= 1 << cell
+            self._xor_hashes(symmetric_zobrist_keys(side)[1][cell])
+            counts, others = self._o_counts, self._x_counts
+            for line in self._cell_lines[cell]:
+                count = counts[line]
+                counts[line] = count + 1
+                if count + 1 == win_len:
+                    self._o_lines += 1
+                # the line either stays open for 'o', or gets blocked for 'x'
+                if not others[line]:
+                    delta -= weights[count + 1] - weights[count]
+                elif not count:
+                    delta -= weights[others[line]]
+        self._open_score += delta
+        self.next_player = 'p2' if self.next_player == 'p1' else 'p1'
+        self.move_history.append(cell)
+
+    def pop_move(self) -> int:
+        """
+        undo the most recent move made on the game board, and return its cell
 
-    def copy_and_place_piece(self, piece: str, spot: str) -> Any:
+        Preconditions:
+            - the game has at least one move in its `move_history`
+        """
+        cell = self.move_history.pop()
+        side = self._board_side
+        win_len = self._win_len
+        weights = self._weights
+        delta = 0
+        if self._x_bits & (1 << cell):
+            self._x_bits ^= 1 << cell
+            self._xor_hashes(symmetric_zobrist_keys(side)[0][cell])
+            counts, others = self._x_counts, self._o_counts
+            for line in self._cell_lines[cell]:
+                count = counts[line]
+                if count == win_len:
+                    self._x_lines -= 1
+                counts[line] = count - 1
+                if not others[line]:
+                    delta -= weights[count] - weights[count - 1]
+                elif count == 1:
+                    delta -= weights[others[line]]
+        else:
+            self._o_bits ^= 1 << cell
+            self._xor_hashes(symmetric_zobrist_keys(side)[1][cell])
+            counts, others = self._o_counts, self._x_counts
+            for line in self._cell_lines[cell]:
+                count = counts[line]
+                if count == win_len:
+                    self._o_lines -= 1
+                counts[line] = count - 1
+                if not others[line]:
+                    delta += weights[count] - weights[count - 1]
+                elif count == 1:
+                    delta += weights[others[line]]
+        self._open_score += delta
+        self.next_player = 'p2' if self.next_player == 'p1' else 'p1'
+        return cell
+
+    def _xor_hashes(self, sym_keys: tuple) -> None:
+        """
+        toggle a cell's keys under each symmetry into the symmetric Zobrist hashes
+        """
+        self._sym_hashes = [h ^ k for h, k in zip(self._sym_hashes, sym_keys)]
+
+    def copy_and_place_piece(self, piece: str, cell: int) -> Any:
         """
         make a copy of the current game state, make a move in the game state copy, and
         return the game state copy object
         """
-        next_player = 'p2' if self.next_player == 'p1' else 'p1'
-        new_board = copy.deepcopy(self._board)
-        new_hist = copy.deepcopy(self.move_history)
-        new_game = GameState(new_board, next_player, new_hist)
-        new_game.place_piece(piece, spot)
+        new_game = GameState.__new__(GameState)
+        new_game._board_side = self._board_side
+        new_game._win_len = self._win_len
+        new_game._cell_lines = self._cell_lines
+        new_game._full_mask = self._full_mask
+        new_game._x_bits = self._x_bits
+        new_game._o_bits = self._o_bits
+        new_game._sym_hashes = self._sym_hashes
+        new_game._x_counts = list(self._x_counts)
+        new_game._o_counts = list(self._o_counts)
+        new_game._x_lines = self._x_lines
+        new_game._o_lines = self._o_lines
+        new_game._weights = self._weights
+        new_game._open_score = self._open_score
+        new_game.move_history = list(self.move_history)
+        new_game.next_player = self.next_player
+        new_game.place_piece(piece, cell)
         return new_game
 
     def get_winning_piece(self) -> str:
         """
         return 'x' or 'o' or `None` as the winner of the game in its current state
-        """
-        # check each row
-        for row in self._board:
-            if all(spot == 'x' for spot in row):
-                return 'x'
-            elif all(spot == 'o' for spot in row):
-                return 'o'
 
-        # grab the side length fo the game board
-        side = self._board_side
+        this takes constant time, since the winning lines filled by each piece are counted
+        as the moves are made; the result always agrees with `_scan_winning_piece`
+
+        >>> game = GameState(empty_board(5), win_len=4)
+        >>> rng = random.Random(0)
+        >>> agree = True
+        >>> for _ in range(200):
+        ...     if game.get_winning_piece() is not None:
+        ...         _ = [game.pop_move() for _ in range(rng.randint(1, 3))]
+        ...     else:
+        ...         piece = 'x' if game.next_player == 'p1' else 'o'
+        ...         game.push_move(piece, rng.choice(game.empty_cells))
+        ...     agree = agree and game.get_winning_piece() == game._scan_winning_piece()
+        >>> agree
+        True
+        """
+        if self._x_lines:
+            return 'x'
+        elif self._o_lines:
+            return 'o'
+        elif self._x_bits | self._o_bits == self._full_mask:
+            return "tie"
+        else:
+            return None
 
-        # if no winners in rows, check each column
-        for col_num in range(side):
-            if all(row2[col_num] == 'x' for row2 in self._board):
+    def _scan_winning_piece(self) -> str:
+        """
+        return 'x' or 'o' or `None` as the winner of the game in its current state, found
+        by scanning the whole board; kept as a cross-check for `get_winning_piece`
+        """
+        # check every row, column and diagonal against both pieces' bitboards
+        x_bits = self._x_bits
+        o_bits = self._o_bits
+        for mask in win_masks(self._board_side, self._win_len):
+            if x_bits & mask == mask:
                 return 'x'
-            elif all(row2[col_num] == 'o' for row2 in self._board):
+            elif o_bits & mask == mask:
                 return 'o'
 
-        # if still no winners, check the two diagonals
-        # top-left to bottom-right
-        if all(self._board[i][i] == 'x' for i in range(side)):
-            return 'x'
-        elif all(self._board[i][i] == 'o' for i in range(side)):
-            return 'o'
-        # top-right to bottom-left
-        if all(self._board[i][side - i - 1] == 'x' for i in range(side)):
-            return 'x'
-        elif all(self._board[i][side - i - 1] == 'o' for i in range(side)):
-            return 'o'
-
-        # if there are no empty spots in the board then it's a tie
+        # if there are no empty cells in the board then it's a tie
         # [*] this can be improved by predicting early ties, but I won't implement it
         # right now
-        if not self.empty_spots:
+        if x_bits | o_bits == self._full_mask:
             return "tie"
 
         # otherwise there's no winner yet
@@ -153,6 +713,150 @@ class GameState():
 # Player Classes
 ################################################################################
 
+# search depth of the easy difficulty
+EASY_DEPTH = 2
+
+# default time budget of a hard difficulty move, in seconds
+HARD_TIME_BUDGET = 1.0
+
+# number of nodes searched or generated between two checks of the search budget; the
+# subtrees generated count as well, since expanding a node of a large board costs as much
+# as searching hundreds of nodes
+BUDGET_CHECK_INTERVAL = 256
+
+# default cap on the number of game tree nodes an `AIMinimaxPlayer` keeps between moves
+MAX_TREE_NODES = 200000
+
+# half the width of the aspiration window of a search iteration, around the score of the
+# previous iteration
+ASPIRATION_WINDOW = 64
+
+# number of killer moves remembered at each ply of a search
+KILLER_SLOTS = 2
+
+# shallowest search iteration split across worker processes; shallower iterations are
+# too quick to pay for sending the work to the workers
+PARALLEL_MIN_DEPTH = 4
+
+# Minimax score of a win per empty cell left on the board, plus one; evaluators must
+# score the positions without a winner strictly between -WIN_SCORE and WIN_SCORE
+WIN_SCORE = 1 << 20
+
+# version of the scoring scheme of `AIMinimaxPlayer._score_node`, bumped whenever the
+# scores change, so that results stored by an older version are never reused
+SCORE_VERSION = 2
+
+
+def flat_evaluator(game: GameState) -> int:
+    """
+    evaluator that scores every position without a winner as 0, so that the search only
+    tells won, lost and undecided positions apart
+    """
+    return 0
+
+
+def open_lines_evaluator(game: GameState) -> int:
+    """
+    evaluator that scores a position without a winner by its open winning lines (see
+    `GameState.open_lines_score`), from the point of view of 'x'; the score is kept up to
+    date by the game state on every move, so evaluating takes constant time
+
+    >>> game = GameState(empty_board(3))
+    >>> game.push_move('x', 4)
+    >>> open_lines_evaluator(game)
+    4
+    """
+    return max(1 - WIN_SCORE, min(WIN_SCORE - 1, game.open_lines_score()))
+
+
+class SearchStats:
+    """
+    Statistics of the search made by an `AIMinimaxPlayer` for one move.
+
+    Work done by the worker processes of a parallel search only shows in `nodes`.
+
+    Instance Attributes:
+        - move: the cell played, or `None` until the search is done
+        - depth: the depth of the deepest completed search iteration, or 0 if the move
+          was looked up in the tablebase
+        - nodes: the number of nodes searched over all iterations
+        - leaf_evaluations: the number of positions scored at the depth limit or at the
+          end of a game
+        - cutoffs: the number of alpha-beta cutoffs at each ply, where the root is ply 0
+        - table_probes: the number of transposition table lookups
+        - table_hits: the number of lookups whose stored result was used
+        - tree_size: the number of nodes in the game tree when the search ended
+        - elapsed: the time taken by the move, in seconds
+
+    >>> stats = SearchStats()
+    >>> stats.nodes, stats.depth, stats.table_probes, stats.table_hits = 1000, 3, 8, 2
+    >>> stats.branching_factor(), stats.cache_hit_rate()
+    (10.0, 0.25)
+    """
+    move: Optional[int]
+    depth: int
+    nodes: int
+    leaf_evaluations: int
+    cutoffs: list[int]
+    table_probes: int
+    table_hits: int
+    tree_size: int
+    elapsed: float
+
+    def __init__(self) -> None:
+        self.move = None
+        self.depth = 0
+        self.nodes = 0
+        self.leaf_evaluations = 0
+        self.cutoffs = []
+        self.table_probes = 0
+        self.table_hits = 0
+        self.tree_size = 0
+        self.elapsed = 0.0
+
+    def add_cutoff(self, ply: int) -> None:
+        """
+        count an alpha-beta cutoff at the given ply
+        """
+        while len(self.cutoffs) <= ply:
+            self.cutoffs.append(0)
+        self.cutoffs[ply] += 1
+
+    def branching_factor(self) -> float:
+        """
+        return the effective branching factor of the search: the number of children per
+        node of a uniform tree with as many nodes, as deep as the deepest iteration
+        """
+        if self.depth == 0:
+            return 0.0
+        return round(self.nodes ** (1 / self.depth), 6)
+
+    def cache_hit_rate(self) -> float:
+        """
+        return the share of transposition table lookups whose stored result was used
+        """
+        return self.table_hits / self.table_probes if self.table_probes else 0.0
+
+    def as_dict(self) -> dict:
+        """
+        return the statistics as a dictionary of plain values, including the derived
+        branching factor and cache hit rate
+        """
+        return {
+            "move": self.move,
+            "depth": self.depth,
+            "nodes": self.nodes,
+            "leaf_evaluations": self.leaf_evaluations,
+            "cutoffs": list(self.cutoffs),
+            "table_probes": self.table_probes,
+            "table_hits": self.table_hits,
+            "cache_hit_rate": self.cache_hit_rate(),
+            "branching_factor": self.branching_factor(),
+            "tree_size": self.tree_size,
+            "elapsed": self.elapsed
+        }
+
+
 class Player:
     """
     An abstract class representing a Tic Tac Toe player.
@@ -169,9 +873,19 @@ class Player:
         assert piece in {'x', 'o'}
         self._piece = piece
 
-    def return_move(self, game: GameState, prev_move: str) -> tuple[str, str]:
+    @property
+    def piece(self) -> str:
+        """
+        return the game piece of this player, either 'x' or 'o'
+
+        >>> role_to_player("ai_hard", 'o').piece
+        'o'
         """
-        return the game piece {'x', 'o'} and a move in the given game state
+        return self._piece
+
+    def return_move(self, game: GameState, prev_move: Optional[int]) -> tuple[str, int]:
+        """
+        return the game piece {'x', 'o'} and the cell of a move in the given game state
 
         `prev_move` is the opponent player's most recent move, or `None` if no moves
         have been made
@@ -184,15 +898,15 @@ class AIRandomPlayer(Player):
     An 'AI' player that simply makes random moves that are available in the game state.
     """
 
-    def return_move(self, game: GameState, prev_move: str) -> tuple[str, str]:
+    def return_move(self, game: GameState, prev_move: Optional[int]) -> tuple[str, int]:
         """
-        return the game piece {'x', 'o'} and a move in the given game state;
-        for this player, the move will be chosen at random from the available empty spots
+        return the game piece {'x', 'o'} and the cell of a move in the given game state;
+        for this player, the move will be chosen at random from the available empty cells
 
         `prev_move` is the opponent player's most recent move, or `None` if no moves
         have been made; not used by `AIRandomPlayer`
         """
-        return self._piece, random.choice(game.empty_spots)
+        return self._piece, random.choice(game.empty_cells)
 
 
 class AIMinimaxPlayer(Player):
@@ -200,57 +914,256 @@ class AIMinimaxPlayer(Player):
     An 'AI' player that employs a MiniMax algorithm on a game tree to make moves in the
     game state.
 
+    Moves are searched by iterative deepening: the game tree is searched one ply deeper
+    at a time, starting each iteration with the previous iteration's best move, until the
+    maximum depth is reached or the time or node budget runs out. Each iteration is first
+    searched within an aspiration window around the previous iteration's score. The best
+    move of the deepest completed iteration is played.
+
+    Below the root, the moves of a node are searched in the order most likely to prune
+    the others early: the node's best move in its last search first, then the killer
+    moves of its ply (recent moves that caused a cutoff at the same ply), then the other
+    moves by their history scores (the cutoffs they caused anywhere, kept across moves and
+    halved at every move), and then by `move_order`. The root's moves are searched in
+    `move_order` with the previous iteration's best move first, so that the move played
+    does not depend on the history of the search.
+
     Instance Attributes:
         - `difficulty`: "easy" or "hard"; used to determine search depth of the algorithm
         - `is_x`: True if my piece is 'x', False if my piece is 'o'
+        - `max_depth`: the deepest search to run, or `None` to search as deep as the
+          difficulty allows (`EASY_DEPTH` for "easy", the whole game for "hard")
+        - `time_budget`: the wall-clock time allowed per move in seconds, or `None`
+        - `node_budget`: the number of nodes allowed per move, or `None`
+        - `use_tablebase`: whether "hard" moves are looked up in a perfect-play
+          tablebase (see `tablebase.py`) instead of searched, when one covering the
+          board has been generated
+        - `evaluator`: the function scoring positions without a winner at the search
+          depth limit, from the point of view of 'x'; it must return an integer strictly
+          between -WIN_SCORE and WIN_SCORE, and give the same score to positions that are
+          rotations or reflections of each other
+        - `max_tree_nodes`: the number of game tree nodes kept between moves; the least
+          recently visited subtrees are released beyond it
+        - `workers`: the number of processes the subtrees of the root are searched on (see
+          `parallel_search.py`), or 1 to search in this process only; parallel searches
+          choose the same moves as serial ones, and need a picklable `evaluator`
+        - `collect_stats`: whether the statistics of every move's search are kept in
+          `last_stats`
+        - `stats_callback`: a function called with the statistics of every move's search,
+          or `None`; statistics are only gathered when they are collected or have a
+          callback, so that searches pay next to nothing for them otherwise
+        - `last_stats`: the statistics of the last move's search, or `None`
     """
     difficulty: str
     is_x: bool
+    max_depth: Optional[int]
+    time_budget: Optional[float]
+    node_budget: Optional[int]
+    use_tablebase: bool
+    evaluator: Callable[[GameState], int]
+    max_tree_nodes: int
+    workers: int
+    collect_stats: bool
+    stats_callback: Optional[Callable[[SearchStats], None]]
+    last_stats: Optional[SearchStats]
 
     # Private Instance Attributes:
-    #   - _tree: game tree generated by the current player
+    #   - _tree: game tree generated by the current player, rooted at the current game
+    #     state; the subtrees of moves that were not played are released
+    #   - _depth: the depth of the last completed search iteration
+    #   - _table: transposition table of the positions searched so far in this game,
+    #     keyed by `GameState.canonical_key` so that symmetric positions share results
+    #   - _nodes: the number of nodes searched for the current move
+    #   - _next_check: the node count at which the search budget is checked next, brought
+    #     closer by the subtrees generated since the last check
+    #   - _deadline: the `time.perf_counter` time at which the current search must stop
+    #   - _node_limit: the node count at which the current search must stop
+    #   - _clock: the number of nodes searched for all previous moves, which stamps
+    #     `GameTree.last_visit` together with `_nodes`
+    #   - _stats: the statistics of the current search, or `None` if they are not
+    #     gathered
+    #   - _root_ply: the number of moves in the game at the root of the current search
+    #   - _killers: the killer moves of each ply of the current search below its root,
+    #     most recent first
+    #   - _history: the history scores of every cell for each piece
     _tree: gt.GameTree
     _depth: int
+    _table: tp.TranspositionTable
+    _nodes: int
+    _next_check: int
+    _deadline: Optional[float]
+    _node_limit: Optional[int]
+    _clock: int
+    _stats: Optional[SearchStats]
+    _root_ply: int
+    _killers: list[list[int]]
+    _history: dict[str, list[int]]
 
-    def __init__(self, piece: str, difficulty: str) -> None:
+    def __init__(
+            self,
+            piece: str,
+            difficulty: str,
+            table: Optional[tp.TranspositionTable] = None,
+            max_depth: Optional[int] = None,
+            time_budget: Optional[float] = None,
+            node_budget: Optional[int] = None,
+            use_tablebase: bool = True,
+            evaluator: Optional[Callable[[GameState], int]] = None,
+            max_tree_nodes: int = MAX_TREE_NODES,
+            workers: int = 1,
+            collect_stats: bool = False,
+            stats_callback: Optional[Callable[[SearchStats], None]] = None
+    ) -> None:
+        """
+        initialize the player; `table` is the transposition table to search with, and a
+        new table with the default memory cap is created if none is given
+
+        "hard" players without a `max_depth` or any budget get a time budget of
+        `HARD_TIME_BUDGET` seconds per move; "hard" players evaluate with
+        `open_lines_evaluator` and "easy" players with `flat_evaluator`, unless another
+        `evaluator` is given
+        """
         super().__init__(piece)
         self.difficulty = difficulty
         self.is_x = True if piece == 'x' else False
+        self.max_depth = max_depth
+        if difficulty == "hard" and max_depth is None and time_budget is None \
+                and node_budget is None:
+            time_budget = HARD_TIME_BUDGET
+        self.time_budget = time_budget
+        self.node_budget = node_budget
+        self.use_tablebase = use_tablebase
+        if evaluator is None:
+            evaluator = open_lines_evaluator if difficulty == "hard" else flat_evaluator
+        self.evaluator = evaluator
+        self.max_tree_nodes = max_tree_nodes
+        self.workers = workers
+        self.collect_stats = collect_stats
+        self.stats_callback = stats_callback
+        self.last_stats = None
         # initialize an empty game tree with my piece, and a 0 x win score
         self._tree = gt.GameTree(None, self.is_x, 0)
+        self._depth = 0
+        self._table = table if table is not None else tp.TranspositionTable()
+        self._nodes = 0
+        self._next_check = BUDGET_CHECK_INTERVAL
+        self._deadline = None
+        self._node_limit = None
+        self._clock = 0
+        self._stats = None
+        self._root_ply = 0
+        self._killers = []
+        self._history = {'x': [], 'o': []}
 
     @staticmethod
     def _score_node(game: GameState) -> int:
         """
         return a Minimax utility score based on the given game state
 
-        There is a scoring constant of '1' when 'x' wins, '-1' when 'x' loses, or '0'
-        otherwise; this constant is multiplied by the number of empty spots left in the
-        game, to incentivize victory in the fewest steps
+        There is a scoring constant of `WIN_SCORE` when 'x' wins, `-WIN_SCORE` when 'x'
+        loses, or '0' otherwise; this constant is multiplied by one more than the number of
+        empty cells left in the game, to incentivize victory in the fewest steps while
+        telling a win on the last cell apart from a tie
 
-        The idea of multiplying the number of empty spots with the scoring constant
+        The idea of multiplying the number of empty cells with the scoring constant
         {1, -1, 0} to reward wins made in fewer steps came from this video:
             https://youtu.be/fT3YWCKvuQE
         NO OTHER IDEAS OR CODE CAME FROM THE ABOVE SOURCE
         """
         piece = game.get_winning_piece()
         if piece == 'x':
-            return 1 * len(game.empty_spots)
+            return WIN_SCORE * (game.count_empty() + 1)
         elif piece == 'o':
-            return -1 * len(game.empty_spots)
+            return -WIN_SCORE * (game.count_empty() + 1)
         else:
             return 0
 
+    def _evaluate(self, game: GameState) -> int:
+        """
+        return the Minimax score of the given game state at the search depth limit: the
+        `_score_node` score if the game is over, or the evaluator's score otherwise
+        """
+        if game.get_winning_piece():
+            return self._score_node(game)
+        return self.evaluator(game)
+
     def _gen_subtrees(self, node: gt.GameTree, game: GameState) -> None:
         """
         generate subtrees for a given node based on the available moves in the game
+
+        each move is made and then undone in place on `game`, so the game state is left
+        unchanged when this method returns; moves that lead to a rotation or reflection
+        of an earlier sibling's position are skipped, since they score the same
         """
         assert node.get_subtrees() == []
-        for spot in game.empty_spots:
-            piece = 'o' if node.is_x_move else 'x'
-            mock_game = game.copy_and_place_piece(piece, spot)
-            score = self._score_node(mock_game)
-            node.add_subtree(gt.GameTree(spot, not node.is_x_move, score))
+        piece = 'o' if node.is_x_move else 'x'
+        next_piece = piece_not(piece)
+        empty = game.empty_bits()
+        seen = set()
+        for cell in move_order(game.get_side_length(), game.get_win_length()):
+            if not empty >> cell & 1:
+                continue
+            game.push_move(piece, cell)
+            key = game.canonical_key(next_piece)
+            if key not in seen:
+                seen.add(key)
+                score = self._evaluate(game)
+                subtree = gt.GameTree(cell, not node.is_x_move, score)
+                subtree.last_visit = node.last_visit
+                node.add_subtree(subtree)
+            game.pop_move()
+        # bring the next budget check closer by the work of generating the subtrees
+        self._next_check -= len(seen)
+
+    def _start_ordering(self, game: GameState) -> None:
+        """
+        prepare the move ordering heuristics for a new search rooted at the given game:
+        forget the killer moves, and halve the history scores, which are reset when the
+        board changes size
+        """
+        self._root_ply = len(game.move_history)
+        self._killers = []
+        cells = game.get_side_length() ** 2
+        for piece, scores in self._history.items():
+            if len(scores) != cells:
+                self._history[piece] = [0] * cells
+            else:
+                self._history[piece] = [score >> 1 for score in scores]
+
+    def _order_subtrees(self, tree: gt.GameTree, subtrees: list, piece: str,
+                        ply: int) -> list:
+        """
+        return the subtrees of a node below the root, where `piece` is to move at `ply`
+        plies below the root, in the order to search them; see the class docstring
+        """
+        history = self._history[piece]
+        killers = self._killers[ply] if ply < len(self._killers) else ()
+        best_cell = tree.best_cell
+
+        def rank(subtree: gt.GameTree) -> int:
+            cell = subtree.cell
+            if cell == best_cell:
+                return -(1 << 62)
+            if cell in killers:
+                return -(1 << 61) + killers.index(cell)
+            return -history[cell]
+
+        return sorted(subtrees, key=rank)
+
+    def _record_cutoff(self, piece: str, cell: int, depth: int, ply: int) -> None:
+        """
+        record that the move of `piece` on the given cell, at `ply` plies below the root
+        with `depth` plies left to search, caused an alpha-beta cutoff
+        """
+        while len(self._killers) <= ply:
+            self._killers.append([])
+        killers = self._killers[ply]
+        if cell not in killers:
+            killers.insert(0, cell)
+            del killers[KILLER_SLOTS:]
+        self._history[piece][cell] += depth * depth
+        if self._stats is not None:
+            self._stats.add_cutoff(ply)
 
     def _minimax(
             self,
@@ -262,133 +1175,651 @@ class AIMinimaxPlayer(Player):
             beta: Union[float, int]
     ) -> None:
         """
-        perform the minimax algorithm with Alpha-Beta pruning recursively to a given depth
-        each subtree to to the given gepth will contain a calculated minimax score as a
-        result
-        see `_score_node` for the scoring scheme
+        search the given node to the given depth within an alpha-beta window from the point
+        of view of 'x', leaving its score in `tree.x_win_score`; see `_negamax`
+        """
+        if piece == 'x':
+            self._negamax(tree, game, depth, piece, alpha, beta)
+        else:
+            self._negamax(tree, game, depth, piece, -beta, -alpha)
+
+    def _negamax(
+            self,
+            tree: gt.GameTree,
+            game: GameState,
+            depth: int,
+            piece: str,
+            alpha: Union[float, int],
+            beta: Union[float, int]
+    ) -> int:
+        """
+        perform the minimax algorithm with alpha-beta pruning recursively to a given depth,
+        in its negamax form: `piece` is to move at the given node, and the alpha-beta
+        window and the returned score are from its point of view, so that the score of a
+        node is the best of the negated scores of its subtrees; every searched node keeps
+        its score from the point of view of 'x' in `x_win_score`
+        see `_score_node` for the scoring scheme, and `evaluator` for the scores at the
+        depth limit
+
+        the first subtree of a node is searched with the full window, and the others by
+        principal variation search: with a null window that only tells whether they beat
+        the best score so far, and again with the full window only if they do; this
+        finds the same scores as searching every subtree with the full window
+
+        all searching happens on the one given game state: every move is pushed before
+        recursing into its subtree and popped afterwards
+
+        before a node below the root is expanded, the transposition table is consulted;
+        results are only reused at the same remaining depth (capped at the number of empty
+        cells), so that the scores found do not depend on the order of the search
         """
         assert piece in {'x', 'o'}
+        sign = 1 if piece == 'x' else -1
+
+        # stop the search once in a while if it has run out of its budget
+        self._nodes += 1
+        if self._nodes >= self._next_check:
+            self._check_budget()
+        tree.last_visit = self._clock + self._nodes
 
         # if we get a winner, or reach the depth limit, or reach a tie, return score;
         # static evaluation
         if depth == 0 or game.get_winning_piece():
-            tree.x_win_score = self._score_node(game)
-
-        # maximizer, 'x'
-        elif piece == 'x':
-            max_score = -1 * (game.get_side_length() ** 2) - 1
+            tree.x_win_score = self._evaluate(game)
+            if self._stats is not None:
+                self._stats.leaf_evaluations += 1
+            return sign * tree.x_win_score
+
+        # look up the position in the transposition table, and skip the search if the
+        # stored result is exact or already falls outside the alpha-beta window; the
+        # table holds scores and bounds from the point of view of 'x'
+        depth = min(depth, game.count_empty())
+        key = game.canonical_key(piece)
+        if tree is not self._tree:
+            entry = self._table.probe(key)
+            if self._stats is not None:
+                self._stats.table_probes += 1
+            if entry is not None and entry[1] == depth:
+                x_score, _, flag = entry
+                score = sign * x_score
+                if sign < 0 and flag != tp.EXACT:
+                    flag = tp.UPPER if flag == tp.LOWER else tp.LOWER
+                if flag == tp.EXACT or (flag == tp.LOWER and score >= beta) \
+                        or (flag == tp.UPPER and score <= alpha):
+                    tree.x_win_score = x_score
+                    if self._stats is not None:
+                        self._stats.table_hits += 1
+                    return score
+        alpha_orig = alpha
+
+        # generate subtrees if depth is not reached but no more subtrees are available
+        subtrees = tree.get_subtrees()
+        if not subtrees:
+            self._gen_subtrees(tree, game)
             subtrees = tree.get_subtrees()
-
-            # generate subtrees if depth is not reached but no more subtrees are available
-            if depth != 0 and subtrees == []:
-                self._gen_subtrees(tree, game)
-
-            # iterate through each subtree, compute the sub score, and maximize
-            for subtree in subtrees:
-                # if the placement recorded in teh current subtree has not been played in
-                # the game yet, create a mock game to facilitate with minimax
-                if subtree.placement not in game.move_history:
-                    mock_game = game.copy_and_place_piece('x', subtree.placement)
-                    self._minimax(subtree, mock_game, depth - 1, 'o', alpha, beta)
-                # if the placement has been played alraedy, directly recurse
-                else:
-                    self._minimax(subtree, game, depth - 1, 'o', alpha, beta)
-
-                max_score = max(max_score, subtree.x_win_score)
-                # update the alpha score, and prune if possible
-                alpha = max(alpha, subtree.x_win_score)
-                if beta <= alpha:
-                    break
-
-            tree.x_win_score = max_score
-
-        # minimizer, 'o'
+        ply = len(game.move_history) - self._root_ply
+        if tree is not self._tree:
+            subtrees = self._order_subtrees(tree, subtrees, piece, ply)
+
+        # iterate through each subtree, compute the sub score, and maximize
+        next_piece = piece_not(piece)
+        best_score = -WIN_SCORE * (game.get_side_length() ** 2 + 2)
+        for idx, subtree in enumerate(subtrees):
+            game.push_move(piece, subtree.cell)
+            if idx == 0:
+                score = -self._negamax(subtree, game, depth - 1, next_piece, -beta, -alpha)
+            else:
+                score = -self._negamax(subtree, game, depth - 1, next_piece,
+                                       -alpha - 1, -alpha)
+                if alpha < score < beta:
+                    score = -self._negamax(subtree, game, depth - 1, next_piece,
+                                           -beta, -alpha)
+            game.pop_move()
+
+            if score > best_score:
+                best_score = score
+                tree.best_cell = subtree.cell
+            # update the alpha score, and prune if possible
+            alpha = max(alpha, score)
+            if beta <= alpha:
+                self._record_cutoff(piece, subtree.cell, depth, ply)
+                break
+        tree.x_win_score = sign * best_score
+
+        # record the result along with whether it is exact or only a bound, from the
+        # point of view of 'x'
+        if best_score <= alpha_orig:
+            flag = tp.UPPER if sign > 0 else tp.LOWER
+        elif best_score >= beta:
+            flag = tp.LOWER if sign > 0 else tp.UPPER
         else:
-            min_score = 1 * (game.get_side_length() ** 2) + 1
-            subtrees = tree.get_subtrees()
-
-            # generate subtrees if depth is not reached but no more subtrees are available
-            if depth != 0 and subtrees == []:
-                self._gen_subtrees(tree, game)
+            flag = tp.EXACT
+        self._table.store(key, tree.x_win_score, depth, flag)
+        return best_score
 
-            # iterate through each subtree, compute the sub score, and minimize
-            for subtree in subtrees:
-                if subtree.placement not in game.move_history:
-                    mock_game = game.copy_and_place_piece('o', subtree.placement)
-                    self._minimax(subtree, mock_game, depth - 1, 'x', alpha, beta)
-                else:
-                    self._minimax(subtree, game, depth - 1, 'x', alpha, beta)
+    def _aspiration_search(self, game: GameState, depth: int,
+                           guess: Optional[int]) -> None:
+        """
+        search the root of the game tree to the given depth within a window of
+        `ASPIRATION_WINDOW` around `guess`, the previous iteration's score from the point
+        of view of my piece, and search it again with the side of the window that the
+        score fell out of opened, until the score falls inside; a full window is used if
+        there is no guess
+        """
+        if guess is None:
+            alpha, beta = float("-inf"), float("inf")
+        else:
+            alpha, beta = guess - ASPIRATION_WINDOW, guess + ASPIRATION_WINDOW
+        while True:
+            score = self._negamax(self._tree, game, depth, self._piece, alpha, beta)
+            if score <= alpha:
+                alpha = float("-inf")
+            elif score >= beta:
+                beta = float("inf")
+            else:
+                return
+
+    def _parallel_minimax(self, game: GameState, depth: int) -> None:
+        """
+        perform the same search as `_minimax` at the root of the game tree, with the
+        subtrees of the root split across `workers` processes in the style of Young
+        Brothers Wait: the first subtree is searched here to find a bound, and then the
+        other subtrees are searched in parallel, each within the best bound found when
+        its search starts
+
+        a subtree that fails against its bound with a score equal to the best score may
+        still be as good as the best move, so it is searched again with a null window;
+        this picks the same move with the same score as `_minimax`
+        """
+        import parallel_search as ps  # process pools are not available in the browser
+
+        tree = self._tree
+        self._nodes += 1
+        tree.last_visit = self._clock + self._nodes
+        depth = min(depth, game.count_empty())
+        if not tree.get_subtrees():
+            self._gen_subtrees(tree, game)
+        piece = self._piece
+        next_piece = piece_not(piece)
+        sign = 1 if self.is_x else -1
+
+        # the eldest brother is searched first, with the full window
+        first = tree.get_subtrees()[0]
+        game.push_move(piece, first.cell)
+        self._minimax(first, game, depth - 1, next_piece, float("-inf"), float("inf"))
+        game.pop_move()
+
+        # the younger brothers are searched by the workers, and merged into the tree
+        deadline = None
+        if self._deadline is not None:
+            deadline = time.time() + (self._deadline - time.perf_counter())
+        node_budget = None
+        if self._node_limit is not None:
+            node_budget = max(1, self._node_limit - self._nodes)
+        results = ps.search_subtrees(
+            self.workers, (piece, self.difficulty, self.evaluator), game,
+            [subtree.cell for subtree in tree.get_subtrees()[1:]], depth,
+            first.x_win_score, self._clock + self._nodes, deadline, node_budget,
+            self.max_tree_nodes // len(tree.get_subtrees())
+        )
+        exact = [True]
+        for subtree, bound, nodes in results:
+            tree.add_subtree(subtree)
+            exact.append(sign * subtree.x_win_score > sign * bound)
+            self._nodes += nodes
+        subtrees = tree.get_subtrees()
+        best_score = sign * max(sign * subtree.x_win_score
+                                for subtree, is_exact in zip(subtrees, exact) if is_exact)
+
+        # settle the subtrees before the best one whose bound ties with the best score
+        for subtree, is_exact in zip(subtrees, exact):
+            if subtree.x_win_score != best_score:
+                continue
+            if is_exact:
+                break
+            game.push_move(piece, subtree.cell)
+            self._minimax(subtree, game, depth - 1, next_piece,
+                          min(best_score - sign, best_score),
+                          max(best_score - sign, best_score))
+            game.pop_move()
+            if sign * subtree.x_win_score >= sign * best_score:
+                subtree.x_win_score = best_score
+                break
+
+        tree.x_win_score = best_score
+        self._table.store(game.canonical_key(piece), best_score, depth, tp.EXACT)
+
+    def search_move(
+            self,
+            game: GameState,
+            cell: int,
+            depth: int,
+            alpha: Union[float, int],
+            beta: Union[float, int],
+            clock: int = 0,
+            time_budget: Optional[float] = None,
+            node_budget: Optional[int] = None
+    ) -> tuple[gt.GameTree, int]:
+        """
+        search the move of my piece on the given cell to the given depth within the given
+        alpha-beta window, and return the subtree of the move along with the number of
+        nodes searched; this is the task run by the workers of a parallel search
 
-                min_score = min(min_score, subtree.x_win_score)
-                # update the beta score, and prune if possible
-                beta = min(beta, subtree.x_win_score)
-                if beta <= alpha:
-                    break
+        `clock` stamps the visits of the search, and `SearchTimeout` is raised if the
+        time (in seconds) or node budget runs out
+        """
+        subtree = gt.GameTree(cell, self.is_x, 0)
+        self._table.new_search()
+        self._nodes = 0
+        self._clock = clock
+        self._next_check = BUDGET_CHECK_INTERVAL
+        self._deadline = None if time_budget is None else time.perf_counter() + time_budget
+        self._node_limit = node_budget
+        if node_budget is not None:
+            self._next_check = min(self._next_check, node_budget)
+
+        history_len = len(game.move_history)
+        self._start_ordering(game)
+        game.push_move(self._piece, cell)
+        try:
+            self._minimax(subtree, game, depth - 1, piece_not(self._piece), alpha, beta)
+        finally:
+            while len(game.move_history) > history_len:
+                game.pop_move()
+        return subtree, self._nodes
+
+    def _check_budget(self) -> None:
+        """
+        raise `SearchTimeout` if the current search has used up its time or node budget,
+        and schedule the next budget check otherwise
+        """
+        if self._deadline is not None and time.perf_counter() >= self._deadline:
+            raise SearchTimeout
+        if self._node_limit is not None and self._nodes >= self._node_limit:
+            raise SearchTimeout
+        self._next_check = self._nodes + BUDGET_CHECK_INTERVAL
+        if self._node_limit is not None:
+            self._next_check = min(self._next_check, self._node_limit)
+
+    def _best_subtree(self) -> gt.GameTree:
+        """
+        return the first subtree of the root with the best score for my piece
+        """
+        if self._piece == 'x':
+            return max(self._tree.get_subtrees(), key=lambda s: s.x_win_score)
+        else:
+            return min(self._tree.get_subtrees(), key=lambda s: s.x_win_score)
 
-            tree.x_win_score = min_score
+    def _report_stats(self, move: int, depth: int, start: float) -> None:
+        """
+        complete the statistics of the current search, if they are gathered, keep them in
+        `last_stats` and pass them to `stats_callback`; `start` is the
+        `time.perf_counter` time at which the search started
+        """
+        stats = self._stats
+        if stats is None:
+            return
+        stats.move = move
+        stats.depth = depth
+        stats.nodes = self._nodes
+        stats.tree_size = self._tree.count_nodes()
+        stats.elapsed = time.perf_counter() - start
+        self._stats = None
+        self.last_stats = stats
+        if self.stats_callback is not None:
+            self.stats_callback(stats)
+
+    def _tablebase_move(self, game: GameState) -> Optional[int]:
+        """
+        return the first cell with the best tablebase score for my piece, or `None` if
+        the tablebase is not used for this game
+        """
+        if not self.use_tablebase or self.difficulty != "hard" or tb is None:
+            return None
+        base = tb.find(game)
+        if base is None or not base.covers(game):
+            return None
+        scores = base.solve(game, self._piece)
+        if None in scores.values():  # the position cannot be reached in a game
+            return None
+        if self._piece == 'x':
+            return max(scores, key=lambda cell: scores[cell])
+        else:
+            return min(scores, key=lambda cell: scores[cell])
 
-    def return_move(self, game: GameState, prev_move: Optional[str]) -> tuple[str, str]:
+    def return_move(
+            self,
+            game: GameState,
+            prev_move: Optional[int],
+            time_budget: Optional[float] = None,
+            node_budget: Optional[int] = None
+    ) -> tuple[str, int]:
         """
-        return the game piece {'x', 'o'} and a move in the given game state by the Minimax
-        algorithm
+        return the game piece {'x', 'o'} and the cell of a move in the given game state by
+        the Minimax algorithm
 
         `prev_move` is the opponent player's most recent move, or `None` if no moves
         have been made
+
+        `time_budget` (in seconds) and `node_budget` override the player's budgets for
+        this move only; the first iteration is always completed, so a move is returned
+        even when the budget is tiny
         """
-        # set the search depth
-        if self.difficulty == "easy":
-            # easy mode will let the algorithm only search 3 steps ahead
-            self._depth = 2
-        else:
-            # hard mode depends onthe board side length, due to computational complexity
-            # side length to search depth mapping recorded in `depthmap`
-            side = game.get_side_length()
-            depthmap = {3: 5, 4: 4, 5: 3}
-            self._depth = depthmap[side]
+        start = time.perf_counter()
+        history_len = len(game.move_history)
+        self._nodes = 0
+        if self.collect_stats or self.stats_callback is not None:
+            self._stats = SearchStats()
 
         if prev_move is None:
-            for spot in game.empty_spots:
-                self._tree.add_subtree(gt.GameTree(spot, self.is_x, 0))
+            # the root is the empty board, and its subtrees are my possible first moves
+            self._tree.is_x_move = not self.is_x
         else:
             # update the game tree to start from the previous move made
-            prevtree = self._tree.find_subtree_by_spot(prev_move)
-            if prevtree is None:
-                prevtree = gt.GameTree(prev_move, not self.is_x, 0)
-                self._tree.add_subtree(prevtree)
-            self._tree = prevtree
-
-        # print(f"Initial subtrees:\n{self._tree}")
-
-        # calculate the minimax score for each subtree
-        subtrees = self._tree.get_subtrees()
-        self._minimax(
-            tree=self._tree,
-            game=game,
-            depth=self._depth,
-            piece=self._piece,
-            alpha=float("-inf"),
-            beta=float("inf")
-        )
+            self._tree = self._tree.reroot(prev_move)
+
+        # play the best move of the tablebase without any search, if it covers the game
+        if (cell := self._tablebase_move(game)) is not None:
+            self._report_stats(cell, 0, start)
+            self._tree = self._tree.reroot(cell)
+            return self._piece, cell
+
+        # set the deepest search depth
+        if self.max_depth is not None:
+            max_depth = self.max_depth
+        elif self.difficulty == "easy":
+            max_depth = EASY_DEPTH
+        else:
+            max_depth = game.count_empty()
+        max_depth = max(1, min(max_depth, game.count_empty()))
+
+        time_budget = self.time_budget if time_budget is None else time_budget
+        node_budget = self.node_budget if node_budget is None else node_budget
+        self._table.new_search()
+        self._start_ordering(game)
+        self._next_check = BUDGET_CHECK_INTERVAL
+        self._deadline = None
+        self._node_limit = None
+
+        # deepen the search one ply at a time until the budget runs out
+        best = None
+        guess = None
+        for depth in range(1, max_depth + 1):
+            # search the best move of the previous iteration first
+            if best is not None:
+                self._tree.move_to_front(best.cell)
+
+            try:
+                if self.workers > 1 and depth >= PARALLEL_MIN_DEPTH \
+                        and len(self._tree.get_subtrees()) > 1:
+                    self._parallel_minimax(game, depth)
+                else:
+                    self._aspiration_search(game, depth, guess)
+            except SearchTimeout:
+                # undo the moves of the interrupted search, and keep the last result
+                while len(game.move_history) > history_len:
+                    game.pop_move()
+                break
+
+            best = self._best_subtree()
+            guess = best.x_win_score if self.is_x else -best.x_win_score
+            self._depth = depth
+
+            # the budget only applies once the first iteration has found a move
+            if time_budget is not None:
+                self._deadline = start + time_budget
+            if node_budget is not None:
+                self._node_limit = node_budget
+                self._next_check = min(self._next_check, node_budget)
+            if self._deadline is not None and time.perf_counter() >= self._deadline:
+                break
+
+        # advance the tree after having made the placement decision, and keep it within
+        # its node cap
+        self._report_stats(best.cell, self._depth, start)
+        self._tree = self._tree.reroot(best.cell)
+        self._tree.evict(self.max_tree_nodes)
+        self._clock += self._nodes
+
+        return self._piece, best.cell
+
+
+class SearchTimeout(Exception):
+    """
+    Raised inside `AIMinimaxPlayer` searches when the search budget has run out.
+    """
 
-        # return the max score placement or min score placement based on my piece
-        if self._piece == 'x':
-            spot_choice = max(subtrees, key=lambda s: s.x_win_score).placement
+
+# default time budget of an `AIMCTSPlayer` move, in seconds
+MCTS_TIME_BUDGET = 1.0
+
+# exploration constant of the UCT rule used by `AIMCTSPlayer`, about the square root of 2
+UCT_EXPLORATION = 1.414
+
+# default cap on the number of search tree nodes an `AIMCTSPlayer` keeps
+MAX_MCTS_NODES = 200000
+
+# number of playouts between two checks of the time budget of an `AIMCTSPlayer`
+PLAYOUT_CHECK_INTERVAL = 16
+
+
+class AIMCTSPlayer(Player):
+    """
+    An 'AI' player that employs Monte Carlo Tree Search with the UCT rule to make moves
+    in the game state, for boards too large for a full-width Minimax search.
+
+    Every playout walks down the search tree by the UCT rule, expands one new node, and
+    finishes the game with uniformly random moves on a pair of bitboards. Won and lost
+    positions are proven up the tree as they are found (MCTS-Solver), so that proven
+    nodes are scored exactly; a proven win is played if there is one, and otherwise the
+    move visited by the most playouts that is not proven to lose. The search tree is kept
+    between moves, so the playouts made below the moves actually played are reused.
+
+    Instance Attributes:
+        - `is_x`: True if my piece is 'x', False if my piece is 'o'
+        - `playouts`: the number of playouts per move, or `None`
+        - `time_budget`: the wall-clock time allowed per move in seconds, or `None`
+        - `exploration`: the exploration constant of the UCT rule
+        - `max_tree_nodes`: the number of search tree nodes kept; playouts stop expanding
+          new nodes beyond it, except for a first move of the root, so that there is
+          always a move to play
+
+    >>> game = GameState(empty_board(6), win_len=4)
+    >>> for cell in [14, 0, 15, 1, 16, 2]:
+    ...     game.place_piece('x' if game.next_player == 'p1' else 'o', cell)
+    >>> player = AIMCTSPlayer('x', playouts=2000, seed=0)
+    >>> player.return_move(game, 2)[1] in {13, 17}  # both win, 3 only blocks
+    True
+    """
+    is_x: bool
+    playouts: Optional[int]
+    time_budget: Optional[float]
+    exploration: float
+    max_tree_nodes: int
+
+    # Private Instance Attributes:
+    #   - _tree: search tree rooted at the current game state; the subtrees of moves that
+    #     were not played are released
+    #   - _tree_size: the number of nodes in `_tree`
+    #   - _rng: random number generator of the playouts
+    _tree: gt.MCTSNode
+    _tree_size: int
+    _rng: random.Random
+
+    def __init__(
+            self,
+            piece: str,
+            playouts: Optional[int] = None,
+            time_budget: Optional[float] = None,
+            exploration: float = UCT_EXPLORATION,
+            max_tree_nodes: int = MAX_MCTS_NODES,
+            seed: Optional[int] = None
+    ) -> None:
+        """
+        initialize the player; players without a playout or time budget get a time budget
+        of `MCTS_TIME_BUDGET` seconds per move, and `seed` seeds the random playouts
+        """
+        super().__init__(piece)
+        self.is_x = piece == 'x'
+        if playouts is None and time_budget is None:
+            time_budget = MCTS_TIME_BUDGET
+        self.playouts = playouts
+        self.time_budget = time_budget
+        self.exploration = exploration
+        self.max_tree_nodes = max_tree_nodes
+        # initialize an empty search tree with my piece
+        self._tree = gt.MCTSNode(None, self.is_x)
+        self._tree_size = 1
+        self._rng = random.Random(seed)
+
+    def return_move(
+            self,
+            game: GameState,
+            prev_move: Optional[int],
+            playouts: Optional[int] = None,
+            time_budget: Optional[float] = None
+    ) -> tuple[str, int]:
+        """
+        return the game piece {'x', 'o'} and the cell of a move in the given game state by
+        Monte Carlo Tree Search
+
+        `prev_move` is the opponent player's most recent move, or `None` if no moves
+        have been made; `playouts` and `time_budget` (in seconds) override the player's
+        budgets for this move only, and at least one playout is always made
+        """
+        side = game.get_side_length()
+        if prev_move is None:
+            self._tree = gt.MCTSNode(None, not self.is_x, game.empty_bits())
         else:
-            spot_choice = min(subtrees, key=lambda s: s.x_win_score).placement
+            self._tree = self._tree.reroot(prev_move, game.empty_bits())
+        self._tree_size = self._tree.count_nodes()
+
+        if playouts is None and time_budget is None:
+            playouts, time_budget = self.playouts, self.time_budget
+        start = time.perf_counter()
+        x_bits, o_bits = game.get_bitboards()
+        masks = win_masks(side, game.get_win_length())
+        lines = cell_lines(side, game.get_win_length())
+        full = (1 << (side * side)) - 1
+
+        count = 0
+        while True:
+            self._playout(x_bits, o_bits, masks, lines, full)
+            count += 1
+            if playouts is not None and count >= playouts:
+                break
+            if time_budget is not None and count % PLAYOUT_CHECK_INTERVAL == 0 \
+                    and time.perf_counter() - start >= time_budget:
+                break
 
         # advance the tree after having made the placement decision
-        self._tree = self._tree.find_subtree_by_spot(spot_choice)
+        best = self._tree.best_child()
+        self._tree = self._tree.reroot(best.cell, 0)
+        return self._piece, best.cell
+
+    def _playout(self, x_bits: int, o_bits: int, masks: list, lines: list,
+                 full: int) -> None:
+        """
+        make one playout from the root of the search tree, whose position has the given
+        bitboards, and add its reward to every node it passed through
+        """
+        node = self._tree
+        path = [node]
+
+        # select the most promising child until a node with untried moves is reached
+        while node.result is None and not node.untried:
+            node = node.select_child(self.exploration)
+            if node.is_x_move:
+                x_bits |= 1 << node.cell
+            else:
+                o_bits |= 1 << node.cell
+            path.append(node)
+
+        result = node.result
+        if result is None and (self._tree_size < self.max_tree_nodes
+                               or node is self._tree and not node.get_children()):
+            # expand one of the untried moves
+            untried = list(iter_cells(node.untried))
+            cell = untried[self._rng.randrange(len(untried))]
+            is_x_move = not node.is_x_move
+            if is_x_move:
+                x_bits |= 1 << cell
+                if _completes_line(x_bits, cell, masks, lines):
+                    result = 1.0
+            else:
+                o_bits |= 1 << cell
+                if _completes_line(o_bits, cell, masks, lines):
+                    result = 0.0
+            empty = full & ~(x_bits | o_bits)
+            if result is None and not empty:
+                result = 0.5
+            child = gt.MCTSNode(cell, is_x_move, empty if result is None else 0, result)
+            node.add_child(child)
+            self._tree_size += 1
+            path.append(child)
+            node = child
+
+        if result is None:
+            result = self._random_game(x_bits, o_bits, not node.is_x_move, masks, lines,
+                                       full)
+        for node in path:
+            node.visits += 1
+            node.x_reward += result
+
+        # prove the parents of a proven node, as far up as they can be proven
+        for idx in range(len(path) - 1, 0, -1):
+            if path[idx].result is None or not path[idx - 1].prove():
+                break
+
+    def _random_game(self, x_bits: int, o_bits: int, x_to_move: bool, masks: list,
+                     lines: list, full: int) -> float:
+        """
+        finish the game with the given bitboards by uniformly random moves, and return
+        its reward for 'x'
+        """
+        empty = list(iter_cells(full & ~(x_bits | o_bits)))
+        self._rng.shuffle(empty)
+        for cell in empty:
+            if x_to_move:
+                x_bits |= 1 << cell
+                if _completes_line(x_bits, cell, masks, lines):
+                    return 1.0
+            else:
+                o_bits |= 1 << cell
+                if _completes_line(o_bits, cell, masks, lines):
+                    return 0.0
+            x_to_move = not x_to_move
+        return 0.5
+
+
+def _completes_line(bits: int, cell: int, masks: list, lines: list) -> bool:
+    """
+    return whether the given bitboard fills one of the winning lines through `cell`;
+    `masks` and `lines` are from `win_masks` and `cell_lines`
 
-        return self._piece, spot_choice
+    >>> _completes_line(0b111, 1, win_masks(3), cell_lines(3))
+    True
+    """
+    for line in lines[cell]:
+        if bits & masks[line] == masks[line]:
+            return True
+    return False
 
 
-def role_to_player(role: str, piece: str) -> Player:
+# roles of the players that make their moves without a human, see `role_to_player`
+AI_ROLES = ("ai_random", "ai_easy", "ai_hard", "ai_mcts")
+
+
+def role_to_player(role: str, piece: str, seed: Optional[int] = None) -> Player:
     """
     helper function to convert the string representation of a player's role and return a
-    `Player` object accordingly; set the `Player` object's piece attribute as given
+    `Player` object accordingly; set the `Player` object's piece attribute as given, and
+    seed the random number generator of players that own one with `seed`
     """
     if role == "ai_random":
         return AIRandomPlayer(piece)
+    elif role == "ai_mcts":
+        return AIMCTSPlayer(piece, seed=seed)
     elif role[:2] == "ai":
         return AIMinimaxPlayer(piece, role[-4:])  # role[-4:] is either "easy" or "hard"
     else:
@@ -415,23 +1846,35 @@ def init_game(
         p1_piece: str,
         start_first: str,
         p2_role: str,
-        p1_role: str = 'human'
+        p1_role: str = 'human',
+        win_len: Optional[int] = None,
+        seed: Optional[int] = None
 ) -> tuple[GameState, Player, Player]:
     """
-    initialize a Tic Tac Toe game on a board of given side length `board_side`;
+    initialize a Tic Tac Toe game on a board of given side length `board_side`, where
+    `win_len` adjacent pieces win the game (the whole side length by default);
     return the game object and the two player objects
+
+    if `seed` is given, the players that own a random number generator are seeded with
+    `2 * seed` for player 1 and `2 * seed + 1` for player 2, so that no two players of
+    games with different seeds draw the same numbers
+
+    >>> _, player1, player2 = init_game(6, 'x', 'p1', "ai_mcts", "ai_mcts", 4, seed=3)
+    >>> player1._rng.random() == random.Random(6).random() != player2._rng.random()
+    True
     """
     assert start_first in {'p1', 'p2', 'nd'}
 
     # create a new game with the board's side lengtn given by `board_side`
-    game = GameState(empty_board(board_side))
+    game = GameState(empty_board(board_side), win_len=win_len)
 
     # set player 2's game piece
     p2_piece = piece_not(p1_piece)
 
     # initialize players' classes
-    player1 = role_to_player(p1_role, p1_piece)
-    player2 = role_to_player(p2_role, p2_piece)
+    seeds = (None, None) if seed is None else (2 * seed, 2 * seed + 1)
+    player1 = role_to_player(p1_role, p1_piece, seeds[0])
+    player2 = role_to_player(p2_role, p2_piece, seeds[1])
 
     # determine which player starts first if left up to random
     start_first = random.choice(['p1', 'p2']) if start_first == 'nd' else start_first
@@ -0,0 +1,115 @@
+from __future__ import annotations
+from typing import Optional
+
+# bound types of a stored score:
+#   - EXACT: the score is the exact minimax value of the position
+#   - LOWER: the search failed high, the exact value is at least the score
+#   - UPPER: the search failed low, the exact value is at most the score
+EXACT = 0
+LOWER = 1
+UPPER = 2
+
+# number of bytes taken by one occupied slot, used to turn a memory cap into a slot
+# count: as measured with `tracemalloc` under 64-bit CPython, the slot pointer (8), the
+# entry tuple (80), its 64-bit key (36) and its score (28, since win scores are beyond
+# the cached small integers), rounded up for the allocator's overhead; the depth, flag
+# and generation are shared integer objects
+ENTRY_BYTES = 160
+
+# default memory cap of a table, 8 MiB
+DEFAULT_MAX_BYTES = 8 * 1024 * 1024
+
+
+class TranspositionTable:
+    """
+    A fixed-capacity table of search results, keyed by the Zobrist hash of a position.
+
+    Each slot holds at most one entry, and a key always maps to slot `key % capacity`.
+    When two keys compete for a slot, the new entry replaces the old one if the old entry
+    was stored during an earlier search, or if the new entry was searched at least as
+    deep; the table therefore never grows past its capacity.
+
+    Instance Attributes:
+        - capacity: the number of slots in the table
+
+    >>> table = TranspositionTable(capacity=4)
+    >>> table.store(key=5, score=3, depth=2, flag=EXACT)
+    >>> table.probe(5)
+    (3, 2, 0)
+    >>> table.store(key=9, score=-1, depth=1, flag=LOWER)  # same slot, shallower
+    >>> table.probe(9) is None
+    True
+    >>> table.new_search()
+    >>> table.store(key=9, score=-1, depth=1, flag=LOWER)  # same slot, newer search
+    >>> table.probe(5) is None, table.probe(9)
+    (True, (-1, 1, 1))
+    """
+    capacity: int
+
+    # Private Instance Attributes:
+    #   - _slots: the table's slots; each is `None` or a tuple of
+    #     (key, score, depth, flag, generation)
+    #   - _generation: counter of the searches made with this table
+    _slots: list
+    _generation: int
+
+    def __init__(self, capacity: Optional[int] = None,
+                 max_bytes: int = DEFAULT_MAX_BYTES) -> None:
+        """
+        initialize an empty table with `capacity` slots, or with as many slots as fit in
+        `max_bytes` if no capacity is given
+
+        >>> import random, tracemalloc
+        >>> rng = random.Random(0)
+        >>> tracemalloc.start()
+        >>> table = TranspositionTable(max_bytes=256 * 1024)
+        >>> for _ in range(4 * table.capacity):
+        ...     table.store(rng.getrandbits(64), rng.randint(1, 2 ** 25), 1, EXACT)
+        >>> tracemalloc.get_traced_memory()[0] <= 256 * 1024
+        True
+        >>> tracemalloc.stop()
+        """
+        if capacity is None:
+            capacity = max_bytes // ENTRY_BYTES
+        if capacity < 1:
+            raise ValueError(f"[!] Transposition table capacity {capacity} is too small.")
+        self.capacity = capacity
+        self._slots = [None] * capacity
+        self._generation = 0
+
+    def probe(self, key: int) -> Optional[tuple]:
+        """
+        return the (score, depth, flag) stored for the given key, or `None` if the key
+        is not in the table
+        """
+        entry = self._slots[key % self.capacity]
+        if entry is not None and entry[0] == key:
+            return entry[1], entry[2], entry[3]
+        return None
+
+    def store(self, key: int, score: int, depth: int, flag: int) -> None:
+        """
+        store a search result for the given key, following the replacement policy
+        """
+        index = key % self.capacity
+        entry = self._slots[index]
+        if entry is None or entry[0] == key or entry[4] != self._generation \
+                or depth >= entry[2]:
+            self._slots[index] = (key, score, depth, flag, self._generation)
+
+    def new_search(self) -> None:
+        """
+        mark the start of a new search, which makes all entries stored so far replaceable
+        """
+        self._generation += 1
+
+    def clear(self) -> None:
+        """
+        remove all entries from the table
+        """
+        self._slots = [None] * self.capacity
+
+
+if __name__ == '__main__':
+    import doctest
+    doctest.testmod()
@@ -1,19 +1,25 @@
-var PWA_CACHE = 'pwa_cache_01';
+// the version of the precache; `python3 python/bundle.py` stamps it with a hash of the
+// precached files, so that changed files install a new cache, while returning clients
+// keep using the files they already have until then
+var PWA_CACHE = 'pwa_cache_99da328c21';
+// URLs are relative to this script, so that the game works under any path
 var urls_to_cache = [
-    '/bot-tac-toe/',
-    '/bot-tac-toe/manifest.webmanifest',
-    '/bot-tac-toe/assets/minireset.min.css',
-    '/bot-tac-toe/style.css',
-    '/bot-tac-toe/assets/brython/brython.js',
-    '/bot-tac-toe/assets/brython/brython_modules.js',
-    '/bot-tac-toe/assets/fonts/HKGrotesk-Medium.woff2',
-    '/bot-tac-toe/assets/fonts/TTTPiece.ttf?r8pxat',
-    '/bot-tac-toe/assets/icons/icon_dropdown.svg',
-    '/bot-tac-toe/assets/icons/favicon.svg',
-    '/bot-tac-toe/assets/icons/favicon_180.png',
-    '/bot-tac-toe/assets/icons/favicon_196.png',
-    '/bot-tac-toe/assets/icons/favicon_512.png',
-    '/bot-tac-toe/python/interaction.py'
+    './',
+    './manifest.webmanifest',
+    './assets/minireset.min.css',
+    './style.css',
+    './assets/brython/brython.js',
+    './assets/brython/brython_modules.js',
+    './assets/brython/brython_stdlib.js',
+    './assets/fonts/HKGrotesk-Medium.woff2',
+    './assets/fonts/TTTPiece.ttf?r8pxat',
+    './assets/icons/icon_dropdown.svg',
+    './assets/icons/favicon.svg',
+    './assets/icons/favicon_180.png',
+    './assets/icons/favicon_196.png',
+    './assets/icons/favicon_512.png',
+    './python/interaction.py',
+    './python/ai_worker.py'
 ];
 
 self.addEventListener("install", function(event) {
@@ -22,7 +28,10 @@ self.addEventListener("install", function(event) {
         caches.open(PWA_CACHE)
         .then(function(cache) {
             console.log('WORKER: opened cache.');
-            return cache.addAll(urls_to_cache);
+            // bypass the HTTP cache, so that a new version never precaches stale files
+            return cache.addAll(urls_to_cache.map(function(url) {
+                return new Request(url, {cache: 'reload'});
+            }));
         })
     );
 });
@@ -36,6 +45,14 @@ self.addEventListener("activate", function(event) {
             if ("navigationPreload" in self.registration) {
                 await self.registration.navigationPreload.enable();
             }
+            // delete the precaches of earlier versions
+            var names = await caches.keys();
+            await Promise.all(names.filter(function(name) {
+                return name !== PWA_CACHE;
+            }).map(function(name) {
+                console.log('WORKER: deleting old cache', name);
+                return caches.delete(name);
+            }));
         })()
     );
     // Tell the active service worker to take control of the page immediately.
@@ -43,9 +60,15 @@ self.addEventListener("activate", function(event) {
 });
 
 self.addEventListener("fetch", function(event) {
+    // requests to the move API are never cached
+    if (event.request.method !== 'GET') {
+        return;
+    }
     console.log("WORKER: Fetching", event.request);
     event.respondWith(
-        caches.match(event.request)
+        // Brython adds cache-busting query strings to the scripts it loads, which are
+        // ignored, since the precache holds a single version of every file
+        caches.match(event.request, {cacheName: PWA_CACHE, ignoreSearch: true})
         .then(function(response) {
             // Cache hit - return response
             if (response) {